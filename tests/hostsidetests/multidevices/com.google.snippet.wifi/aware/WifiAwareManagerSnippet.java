@@ -53,6 +53,7 @@ import android.os.Bundle;
 import android.os.Handler;
 import android.os.HandlerThread;
 import android.os.RemoteException;
+import android.os.SystemClock;
 import android.text.TextUtils;
 import android.util.Base64;
 import android.util.SparseArray;
@@ -75,13 +76,20 @@ import org.json.JSONObject;
 
 import java.nio.charset.StandardCharsets;
 import java.util.ArrayList;
+import java.util.HashSet;
 import java.util.List;
+import java.util.Set;
+import java.util.UUID;
 import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.LinkedBlockingDeque;
+import java.util.concurrent.TimeUnit;
 
 /**
  * Snippet class for exposing {@link WifiAwareManager} APIs.
  */
 public class WifiAwareManagerSnippet implements Snippet {
+    // How long to wait on onAttached before checking for onAttachFailed again.
+    private static final long ATTACH_POLL_INTERVAL_MS = 100;
     private final Context mContext;
     private final WifiAwareManager mWifiAwareManager;
     private final WifiRttManager mWifiRttManager;
@@ -200,6 +208,60 @@ public class WifiAwareManagerSnippet implements Snippet {
         attach(callbackId, identityCb);
     }
 
+    /**
+     * Attaches to Wi-Fi Aware and waits for the attach and identity callbacks in a single call.
+     *
+     * @param timeoutMs The time to wait for each of the callbacks, in milliseconds
+     * @return a {@link JSONObject} with the attach session id and the discovery MAC address.
+     * @throws WifiAwareManagerSnippetException if the attach failed or the callbacks did not
+     *                                          arrive in time.
+     */
+    @Rpc(description = "Attach to Wi-Fi Aware and wait for the session id and identity.")
+    public JSONObject wifiAwareAttachAndGetIdentity(int timeoutMs)
+            throws WifiAwareManagerSnippetException, InterruptedException, JSONException {
+        String sessionId = UUID.randomUUID().toString();
+        attach(sessionId, true);
+        LinkedBlockingDeque<SnippetEvent> attached = EventCache.getInstance().getEventDeque(
+                EventCache.getQueueId(sessionId, "onAttached"));
+        LinkedBlockingDeque<SnippetEvent> attachFailed = EventCache.getInstance().getEventDeque(
+                EventCache.getQueueId(sessionId, "onAttachFailed"));
+        long deadlineMs = SystemClock.elapsedRealtime() + timeoutMs;
+        // Wait on both callbacks, so that a failed attach is reported right away.
+        while (true) {
+            long remainingMs = Math.max(0, deadlineMs - SystemClock.elapsedRealtime());
+            if (attached.pollFirst(Math.min(ATTACH_POLL_INTERVAL_MS, remainingMs),
+                    TimeUnit.MILLISECONDS) != null) {
+                break;
+            }
+            if (attachFailed.pollFirst() != null) {
+                throw new WifiAwareManagerSnippetException("Wi-Fi Aware attach failed.");
+            }
+            if (remainingMs == 0) {
+                throw new WifiAwareManagerSnippetException(
+                        "Timed out waiting(" + timeoutMs + " millis) for Wi-Fi Aware attach.");
+            }
+        }
+        SnippetEvent identity = pollEvent(sessionId, "WifiAwareAttachOnIdentityChanged",
+                timeoutMs);
+        if (identity == null) {
+            // Do not leave the attach session behind for the caller to clean up.
+            wifiAwareDetach(sessionId);
+            throw new WifiAwareManagerSnippetException(
+                    "Timed out waiting(" + timeoutMs + " millis) for Wi-Fi Aware identity.");
+        }
+        JSONObject result = new JSONObject();
+        result.put("sessionId", sessionId);
+        result.put("mac", identity.getData().getString("mac"));
+        return result;
+    }
+
+    private static SnippetEvent pollEvent(String callbackId, String eventName, int timeoutMs)
+            throws InterruptedException {
+        String qId = EventCache.getQueueId(callbackId, eventName);
+        return EventCache.getInstance().getEventDeque(qId)
+                .pollFirst(timeoutMs, TimeUnit.MILLISECONDS);
+    }
+
     private void attach(String callbackId, boolean identityCb) {
         AttachCallback attachCallback = new AttachCallback() {
             @Override
@@ -694,15 +756,95 @@ public class WifiAwareManagerSnippet implements Snippet {
         }
     }
 
+    /**
+     * Closes a Wi-Fi Aware discovery session and detaches its Aware session in one call.
+     *
+     * @param discoverySessionId The Id of the discovery session
+     * @param sessionId The Id of the Aware attach session, or null to keep it attached
+     */
+    @Rpc(description = "Close a Wi-Fi Aware discovery session and detach its Aware session.")
+    public void wifiAwareCloseSessionAndDetach(
+            String discoverySessionId, @RpcOptional String sessionId) {
+        wifiAwareCloseDiscoverSession(discoverySessionId);
+        if (sessionId != null) {
+            wifiAwareDetach(sessionId);
+        }
+    }
+
+    /**
+     * Waits for an event and drains up to {@code maxCount} queued events in a single call.
+     *
+     * @param callbackId    The callback Id the events were posted with
+     * @param eventName     The name of the events to collect
+     * @param timeoutMs     The time to wait for the first event, in milliseconds
+     * @param maxCount      The maximum number of events to return
+     * @param callbackNames If set, only events whose "callbackName" is in this list are
+     *                      returned; the others are dropped on the device
+     * @return a {@link JSONArray} of the collected events, empty if none arrived in time.
+     * @throws InterruptedException if interrupted while waiting for the first event.
+     * @throws JSONException        if an event cannot be serialized.
+     */
+    @Rpc(description = "Wait for and drain up to maxCount queued snippet events.")
+    public JSONArray wifiAwareDrainEvents(String callbackId, String eventName, int timeoutMs,
+            int maxCount, @RpcOptional JSONArray callbackNames)
+            throws InterruptedException, JSONException {
+        Set<String> wanted = null;
+        if (callbackNames != null) {
+            wanted = new HashSet<>();
+            for (int i = 0; i < callbackNames.length(); i++) {
+                wanted.add(callbackNames.getString(i));
+            }
+        }
+        long deadlineMs = SystemClock.elapsedRealtime() + timeoutMs;
+        JSONArray events = new JSONArray();
+        String qId = EventCache.getQueueId(callbackId, eventName);
+        LinkedBlockingDeque<SnippetEvent> q = EventCache.getInstance().getEventDeque(qId);
+        SnippetEvent event = pollEvent(callbackId, eventName, timeoutMs);
+        while (event != null) {
+            if (wanted == null || wanted.contains(event.getData().getString("callbackName"))) {
+                events.put(event.toJson());
+                if (events.length() >= maxCount) {
+                    break;
+                }
+            }
+            // Keep waiting for the first wanted event until the deadline.
+            long remainingMs =
+                    events.length() == 0 ? deadlineMs - SystemClock.elapsedRealtime() : 0;
+            event = remainingMs > 0
+                    ? q.pollFirst(remainingMs, TimeUnit.MILLISECONDS) : q.pollFirst();
+        }
+        return events;
+    }
+
     /**
      * Closes all Wi-Fi Aware session if it is active. And clear all cache sessions
+     *
+     * @param keepSessionIds If set, the attach sessions with these Ids are kept open; all
+     *                       discovery sessions are still closed
      */
     @Rpc(description = "Close the current Wi-Fi Aware session.")
-    public void wifiAwareCloseAllWifiAwareSession() {
-        for (WifiAwareSession session : mAttachSessions.values()) {
-            session.close();
+    public void wifiAwareCloseAllWifiAwareSession(@RpcOptional JSONArray keepSessionIds)
+            throws JSONException {
+        Set<String> keep = new HashSet<>();
+        if (keepSessionIds != null) {
+            for (int i = 0; i < keepSessionIds.length(); i++) {
+                keep.add(keepSessionIds.getString(i));
+            }
+            // Closing an attach session closes its discovery sessions, but the kept ones
+            // have to be closed explicitly.
+            for (DiscoverySession session : mDiscoverySessions.values()) {
+                session.close();
+            }
+        }
+        for (String sessionId : mAttachSessions.keySet()) {
+            if (!keep.contains(sessionId)) {
+                // onAwareSessionTerminated may have removed it in the meantime.
+                WifiAwareSession session = mAttachSessions.remove(sessionId);
+                if (session != null) {
+                    session.close();
+                }
+            }
         }
-        mAttachSessions.clear();
         mDiscoverySessions.clear();
         mPeerHandles.clear();
     }
@@ -786,7 +928,7 @@ public class WifiAwareManagerSnippet implements Snippet {
 
     @Override
     public void shutdown() throws Exception {
-        wifiAwareCloseAllWifiAwareSession();
+        wifiAwareCloseAllWifiAwareSession(null);
     }
 
     /**
@@ -16,8 +16,10 @@
 """Util for aware test."""
 import base64
 import datetime
+import gzip
 import json
 import logging
+import math
 import os
 import statistics
 import time
@@ -40,6 +42,12 @@ _TIMEOUT_INTERVAL_IN_SEC = 1
 _WAIT_WIFI_STATE_TIME_OUT = datetime.timedelta(seconds=10)
 _WAIT_TIME_SEC = 3
 _CONTROL_WIFI_TIMEOUT_SEC = 10
+# Header of the single-column CSV written by extract_stats.
+STATS_CSV_HEADER = "log_message"
+# Header of the CDF CSV written by extract_stats.
+CDF_CSV_HEADER = "value,cdf"
+# Header of the samples CSV written by extract_stats.
+SAMPLES_CSV_HEADER = "value"
 _REQUEST_NETWORK_TIMEOUT_MS = 15 * 1000
 # arbitrary timeout for events
 _EVENT_TIMEOUT = 10
@@ -94,21 +102,24 @@ def control_wifi(
       wifi_state: True if or Wi-Fi on False if Wi-Fi off.
       timeout_seconds: Maximum wait time (seconds), default is 10 seconds.
 
+    Returns:
+      True if the Wi-Fi state was changed, False if it was already set.
+
     Raises:
       TimeoutError: If the Wi-Fi state cannot be set within the timeout (in seconds).
     """
     if _check_wifi_status(ad) == wifi_state:
-        return
+        return False
     if wifi_state:
         ad.adb.shell("svc wifi enable")
     else:
         ad.adb.shell("svc wifi disable")
-    start_time = time.time()
+    start_time = time.monotonic()
     while True:
         if _check_wifi_status(ad) == wifi_state:
-            return
+            return True
         # Check for timeout
-        if time.time() - start_time > _CONTROL_WIFI_TIMEOUT_SEC:
+        if time.monotonic() - start_time > _CONTROL_WIFI_TIMEOUT_SEC:
             raise TimeoutError(
                 f"Failed to set Wi-Fi state to {wifi_state} within {_CONTROL_WIFI_TIMEOUT_SEC} seconds."
             )
@@ -375,6 +386,18 @@ def reset_device_statistics(ad: android_device.AndroidDevice,):
   """
   ad.adb.shell("cmd wifiaware native_cb get_cb_count --reset")
 
+def reset_device_parameters_and_statistics(ad: android_device.AndroidDevice):
+  """Reset device configurations and statistics in a single adb shell call.
+
+  Equivalent to reset_device_parameters followed by reset_device_statistics.
+
+  Args:
+    ad: device to be reset
+  """
+  ad.adb.shell(
+      "cmd wifiaware reset && cmd wifiaware native_cb get_cb_count --reset"
+  )
+
 def get_aware_capabilities(ad: android_device.AndroidDevice):
     """Get the Wi-Fi Aware capabilities from the specified device. The
   capabilities are a dictionary keyed by aware_const.CAP_* keys.
@@ -635,7 +658,7 @@ def wait_for_networks(
     transport_info_class_name = network_callback_event.data[
         constants.NetworkCbEventKey.TRANSPORT_INFO_CLASS_NAME
     ]
-    ad.log.info(f'got class_name {transport_info_class_name}')
+    ad.log.info('got class_name %s', transport_info_class_name)
     asserts.assert_equal(
         transport_info_class_name,
         constants.AWARE_NETWORK_INFO_CLASS_NAME,
@@ -682,12 +705,12 @@ def wait_for_network(
                 event_name=constants.NetworkCbEventName.NETWORK_CALLBACK,
                 timeout=_DEFAULT_TIMEOUT,
             )
-            ad.log.info(f'Attempt {attempt + 1}: Collected event'
-                        f' {event.data.get(_CALLBACK_NAME)}')
+            ad.log.info('Attempt %d: Collected event %s', attempt + 1,
+                        event.data.get(_CALLBACK_NAME))
             collected_events.append(event)
         except Empty:
-            ad.log.info(f'Attempt {attempt + 1}: No event received in time.'
-                        ' Stopping collection.')
+            ad.log.info('Attempt %d: No event received in time.'
+                        ' Stopping collection.', attempt + 1)
             # If the queue is empty, no need to try again.
             break
         except Exception as e:
@@ -723,7 +746,7 @@ def wait_for_network(
         transport_info_class_name = success_event.data[
             constants.NetworkCbEventKey.TRANSPORT_INFO_CLASS_NAME
         ]
-        ad.log.info(f'Got class_name {transport_info_class_name}')
+        ad.log.info('Got class_name %s', transport_info_class_name)
         asserts.assert_equal(
             transport_info_class_name,
             constants.AWARE_NETWORK_INFO_CLASS_NAME,
@@ -928,6 +951,16 @@ def iperf_server(ad,  extra_args=""):
         return False, clean_out
     return True, clean_out
 
+def _power_setting_command(mode, name, value):
+    """Returns the command-line API command configuring the power setting.
+
+    Args:
+        mode: The power mode being set, should be "default", "inactive", or "idle"
+        name: One of the power settings from 'wifiaware set-power'.
+        value: An integer.
+    """
+    return "cmd wifiaware native_api set-power %s %s %d" % (mode, name, value)
+
 def configure_power_setting(dut, mode, name, value):
     """Use the command-line API to configure the power setting
 
@@ -937,7 +970,7 @@ def configure_power_setting(dut, mode, name, value):
         name: One of the power settings from 'wifiaware set-power'.
         value: An integer.
     """
-    dut.adb.shell("cmd wifiaware native_api set-power %s %s %d" % (mode, name, value))
+    dut.adb.shell(_power_setting_command(mode, name, value))
 
 
 def config_power_settings(dut,
@@ -959,53 +992,82 @@ def config_power_settings(dut,
     enable_dw_early_term: If True then enable early termination of the DW. If
                           None then not set.
     """
-    configure_power_setting(dut, "default", "dw_24ghz", dw_24ghz)
-    configure_power_setting(dut, "default", "dw_5ghz", dw_5ghz)
-    configure_power_setting(dut, "inactive", "dw_24ghz", dw_24ghz)
-    configure_power_setting(dut, "inactive", "dw_5ghz", dw_5ghz)
-
+    settings = [("dw_24ghz", dw_24ghz), ("dw_5ghz", dw_5ghz)]
     if disc_beacon_interval is not None:
-        configure_power_setting(dut, "default", "disc_beacon_interval_ms",
-                                disc_beacon_interval)
-        configure_power_setting(dut, "inactive", "disc_beacon_interval_ms",
-                                disc_beacon_interval)
-
+        settings.append(("disc_beacon_interval_ms", disc_beacon_interval))
     if num_ss_in_disc is not None:
-        configure_power_setting(dut, "default", "num_ss_in_discovery",
-                                num_ss_in_disc)
-        configure_power_setting(dut, "inactive", "num_ss_in_discovery",
-                                num_ss_in_disc)
-
+        settings.append(("num_ss_in_discovery", num_ss_in_disc))
     if enable_dw_early_term is not None:
-        configure_power_setting(dut, "default", "enable_dw_early_term",
-                                enable_dw_early_term)
-        configure_power_setting(dut, "inactive", "enable_dw_early_term",
-                                enable_dw_early_term)
+        settings.append(("enable_dw_early_term", enable_dw_early_term))
+    # Apply all settings in a single adb shell round trip.
+    dut.adb.shell(" && ".join(
+        _power_setting_command(mode, name, value)
+        for name, value in settings
+        for mode in ("default", "inactive")))
+
+def extract_stats(ad, data, results, key_prefix, log_prefix, csv_filepath=None,
+                  io_executor=None, csv_rows=None, cdf_filepath=None,
+                  samples_filepath=None):
+    """Extracts statistics of the data into the results dictionary.
 
-def extract_stats(ad, data, results, key_prefix, log_prefix, csv_filepath=None):
+    Args:
+        ad: Device used for logging.
+        data: A list of samples.
+        results: Dictionary to be populated with the statistics.
+        key_prefix: Prefix of the keys added to results.
+        log_prefix: Prefix of the logged summary.
+        csv_filepath: If set, the summary is appended to this CSV file.
+        io_executor: If set, the CSV rows are written on this executor instead
+                     of blocking the caller.
+        csv_rows: If set, the CSV row is appended to this list instead of
+                  csv_filepath, for the caller to write with write_rows_to_csv.
+        cdf_filepath: If set, the CDF is written to this CSV file and its
+                      results entry holds the file path instead of the CDF.
+        samples_filepath: If set, the samples are written to this CSV file and
+                          the raw_data results entry holds the file path.
+                          The samples are not added to results otherwise.
+    """
     num_samples = len(data)
     results[f'{key_prefix}num_samples'] = num_samples
     if not data:
         return
-    data_min = min(data)
-    data_max = max(data)
-    data_mean = statistics.mean(data)
-    data_cdf = extract_cdf(data)
+    # Sort once and reuse it for min/max and the CDF.
+    sorted_data = sorted(data)
+    data_min = sorted_data[0]
+    data_max = sorted_data[-1]
+    data_mean = statistics.fmean(sorted_data)
+    data_cdf = extract_cdf(sorted_data, is_sorted=True)
     data_cdf_decile = extract_cdf_decile(data_cdf)
 
     # --- Populate the results dictionary ---
     results[f'{key_prefix}min'] = data_min
     results[f'{key_prefix}max'] = data_max
     results[f'{key_prefix}mean'] = data_mean
-    results[f'{key_prefix}cdf'] = data_cdf
+    if cdf_filepath:
+        # The full CDF is as large as the raw data, so the test record only
+        # points to the file it is streamed to.
+        cdf_rows = [f'{x},{y}' for x, y in zip(*data_cdf)]
+        _write_stats_rows(
+            io_executor, cdf_filepath, CDF_CSV_HEADER, cdf_rows)
+        results[f'{key_prefix}cdf'] = cdf_filepath
+    else:
+        results[f'{key_prefix}cdf'] = data_cdf
     results[f'{key_prefix}cdf_decile'] = data_cdf_decile
-    results[f'{key_prefix}raw_data'] = data
+    if samples_filepath:
+        # Likewise for the samples, in the order they were collected.
+        _write_stats_rows(
+            io_executor, samples_filepath, SAMPLES_CSV_HEADER,
+            [str(x) for x in data])
+        results[f'{key_prefix}raw_data'] = samples_filepath
     # --- Build the log string and handle CSV output ---
     log_message = ""
-    csv_header = "log_message" # A simple header for our single-column CSV
 
     if num_samples > 1:
-        data_stdev = statistics.stdev(data)
+        # Plain float arithmetic; statistics.stdev() computes with exact
+        # fractions, which is much slower for no gain on millisecond samples.
+        data_stdev = math.sqrt(
+            math.fsum((x - data_mean) ** 2 for x in sorted_data)
+            / (num_samples - 1))
         results[f'{key_prefix}stdev'] = data_stdev
         # Format the string that will be used for both logging and the CSV
         log_message = (
@@ -1023,14 +1085,28 @@ def extract_stats(ad, data, results, key_prefix, log_prefix, csv_filepath=None):
     # Log the message to the console/logcat
     ad.log.info(log_message)
     # If a CSV file path was provided, write the same message to the file
-    if csv_filepath:
-        write_to_csv(csv_filepath, csv_header, log_message)
+    if csv_rows is not None:
+        csv_rows.append(log_message)
+    elif csv_filepath:
+        if io_executor is not None:
+            io_executor.submit(
+                write_to_csv, csv_filepath, STATS_CSV_HEADER, log_message)
+        else:
+            write_to_csv(csv_filepath, STATS_CSV_HEADER, log_message)
+
+def _write_stats_rows(io_executor, filepath, header, rows):
+    """Writes rows to a CSV file, on io_executor if it is set."""
+    if io_executor is not None:
+        io_executor.submit(write_rows_to_csv, filepath, header, rows)
+    else:
+        write_rows_to_csv(filepath, header, rows)
 
-def extract_cdf(data):
+def extract_cdf(data, is_sorted=False):
     """Calculates the Cumulative Distribution Function (CDF) of the data.
 
     Args:
         data: A list containing data (does not have to be sorted).
+        is_sorted: True if data is already sorted in ascending order.
 
     Returns: a list of 2 lists: the X and Y axis of the CDF.
     """
@@ -1038,21 +1114,16 @@ def extract_cdf(data):
     cdf = []
     if not data:
         return (x, cdf)
-    all_values = sorted(data)
-    for val in all_values:
-        if not x:
-            x.append(val)
-            cdf.append(1)
+    all_values = data if is_sorted else sorted(data)
+    # Record the cumulative count at the last occurrence of each value.
+    for count, val in enumerate(all_values, start=1):
+        if x and x[-1] == val:
+            cdf[-1] = count
         else:
-            if x[-1] == val:
-                cdf[-1] += 1
-            else:
-                x.append(val)
-                cdf.append(cdf[-1] + 1)
+            x.append(val)
+            cdf.append(count)
     scale = 1.0 / len(all_values)
-    for i in range(len(cdf)):
-        cdf[i] = cdf[i] * scale
-    return (x, cdf)
+    return (x, [count * scale for count in cdf])
 
 def extract_cdf_decile(cdf):
     """Extracts the 10%, 20%, ..., 90% points from the CDF and returns their
@@ -1073,15 +1144,49 @@ def extract_cdf_decile(cdf):
             break
     return decades
 
+class RunningStats:
+    """Running mean and variance of a series of samples.
+
+    Uses Welford's algorithm, so a sample loop can check how tight the mean
+    is after every sample without keeping or re-scanning the samples.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, x):
+        """Adds a sample."""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def relative_ci_half_width(self, z=1.96):
+        """Returns the confidence interval half-width relative to the mean.
+
+        Args:
+            z: z-score of the confidence level, 1.96 for 95%.
+
+        Returns:
+            z * standard error / mean, or infinity with fewer than two
+            samples or a zero mean.
+        """
+        if self.count < 2 or self.mean == 0:
+            return math.inf
+        sem = math.sqrt(self._m2 / (self.count - 1) / self.count)
+        return z * sem / abs(self.mean)
+
 # The new function to save the results
 def save_results_to_json(results: dict, filepath: str):
     """Saves a dictionary to a file in a human-readable JSON format."""
     try:
         with open(filepath, 'w') as f:
             json.dump(results, f, indent=4)
-        logging.info(f"Successfully saved results to {filepath}")
+        logging.info("Successfully saved results to %s", filepath)
     except IOError as e:
-        logging.error(f"Failed to write to file {filepath}: {e}")
+        logging.error("Failed to write to file %s: %s", filepath, e)
     except TypeError as e:
         logging.error(
             f"Data contains a type that cannot be serialized to JSON: {e}")
@@ -1096,16 +1201,30 @@ def write_to_csv(filepath: str, header: str, row: str):
         header: The header string to write if the file is new.
         row: The data string to append as a new line.
     """
+    write_rows_to_csv(filepath, header, (row,))
+
+def write_rows_to_csv(filepath: str, header: str, rows):
+    """
+    Appends rows to a CSV file with a single open.
+    Creating it and adding a header if it doesn't exist.
+    A filepath ending in .gz is appended to as gzip.
+
+    Args:
+        filepath: The path to the CSV file.
+        header: The header string to write if the file is new.
+        rows: The data strings to append, one per line.
+    """
     try:
         # Check if the file exists to decide whether to write the header
         file_exists = os.path.exists(filepath)
 
         # Use 'a' (append mode) to add to the file without overwriting it
-        with open(filepath, 'a') as f:
+        opener = gzip.open if filepath.endswith('.gz') else open
+        with opener(filepath, 'at') as f:
             if not file_exists:
                 f.write(header + '\n')
-            f.write(row + '\n')
+            f.writelines(row + '\n' for row in rows)
 
     except IOError as e:
         # Use the standard logging module for errors
-        logging.error(f"Could not write to CSV file {filepath}: {e}")
+        logging.error("Could not write to CSV file %s: %s", filepath, e)
@@ -31,25 +31,61 @@ import wifi_aware_protocols_multi_country_test
 import wifi_aware_protocols_test
 
 
+# Name of the user param selecting which group of test classes to run.
+_TEST_CLASS_GROUP_PARAM = 'wifi_aware_test_class_group'
+
+# All test classes, in the order they run when no group is selected.
+_ALL_TEST_CLASSES = (
+    wifi_aware_attached_test.WifiAwareAttachTest,
+    wifi_aware_capabilities_test.WifiAwareCapabilitiesTest,
+    wifi_aware_datapath_test.WifiAwareDatapathTest,
+    wifi_aware_discovery_test.WifiAwareDiscoveryTest,
+    wifi_aware_discovery_with_ranging_test.WiFiAwareDiscoveryWithRangingTest,
+    wifi_aware_mac_random_test.MacRandomTest,
+    wifi_aware_matchfilter_test.WifiAwareMatchFilterTest,
+    wifi_aware_message_test.WifiAwareMessageTest,
+    wifi_aware_protocols_multi_country_test.ProtocolsMultiCountryTest,
+    wifi_aware_protocols_test.WifiAwareProtocolsTest,
+)
+
+# Test classes that do not depend on state left behind by other classes.
+# They can be sharded onto a separate testbed and run concurrently with the
+# stateful group.
+_INDEPENDENT_TEST_CLASSES = (
+    wifi_aware_capabilities_test.WifiAwareCapabilitiesTest,
+    wifi_aware_mac_random_test.MacRandomTest,
+    wifi_aware_matchfilter_test.WifiAwareMatchFilterTest,
+    wifi_aware_protocols_multi_country_test.ProtocolsMultiCountryTest,
+)
+
+_TEST_CLASS_GROUPS = {
+    'all': _ALL_TEST_CLASSES,
+    'independent': _INDEPENDENT_TEST_CLASSES,
+    'stateful': tuple(
+        test_class
+        for test_class in _ALL_TEST_CLASSES
+        if test_class not in _INDEPENDENT_TEST_CLASSES
+    ),
+}
+
+
 class WifiAwareIntegrationTestSuite(base_suite.BaseSuite):
-  """Wi-Fi Aware integration test suite."""
+  """Wi-Fi Aware integration test suite.
+
+  By default all test classes are run. Setting the user param
+  `wifi_aware_test_class_group` to `independent` or `stateful` runs only that
+  group, so the suite can be split across two testbeds running concurrently.
+  """
 
   def setup_suite(self, config):
-    del config  # Unused.
-    self.add_test_class(wifi_aware_attached_test.WifiAwareAttachTest)
-    self.add_test_class(wifi_aware_capabilities_test.WifiAwareCapabilitiesTest)
-    self.add_test_class(wifi_aware_datapath_test.WifiAwareDatapathTest)
-    self.add_test_class(wifi_aware_discovery_test.WifiAwareDiscoveryTest)
-    self.add_test_class(
-        wifi_aware_discovery_with_ranging_test.WiFiAwareDiscoveryWithRangingTest
-    )
-    self.add_test_class(wifi_aware_mac_random_test.MacRandomTest)
-    self.add_test_class(wifi_aware_matchfilter_test.WifiAwareMatchFilterTest)
-    self.add_test_class(wifi_aware_message_test.WifiAwareMessageTest)
-    self.add_test_class(
-        wifi_aware_protocols_multi_country_test.ProtocolsMultiCountryTest
-    )
-    self.add_test_class(wifi_aware_protocols_test.WifiAwareProtocolsTest)
+    group = config.user_params.get(_TEST_CLASS_GROUP_PARAM, 'all')
+    if group not in _TEST_CLASS_GROUPS:
+      raise ValueError(
+          f'Unknown {_TEST_CLASS_GROUP_PARAM} "{group}", expected one of '
+          f'{sorted(_TEST_CLASS_GROUPS)}.'
+      )
+    for test_class in _TEST_CLASS_GROUPS[group]:
+      self.add_test_class(test_class)
 
 
 if __name__ == '__main__':
@@ -14,12 +14,16 @@
 
 # Lint as: python3
 """Wi-Fi Aware Latency test reimplemented in Mobly."""
+from collections.abc import Sequence
+import concurrent.futures
+import functools
 import logging
 import sys
 import time
 import json
 import queue
 import os
+import statistics
 
 from android.platform.test.annotations import ApiTest
 from aware import aware_lib_utils as autils
@@ -32,6 +36,7 @@ from mobly import utils
 from mobly.controllers import android_device
 from mobly.controllers.android_device_lib import callback_handler_v2
 from mobly.snippet import callback_event
+from mobly.snippet import errors
 # from queue import Empty
 
 
@@ -52,12 +57,17 @@ _SESSION_CB_KEY_MESSAGE_AS_STRING= (
 _SESSION_CB_KEY_LATENCY_MS = (
     constants.DiscoverySessionCallbackParamsType.SESSION_CB_KEY_LATENCY_MS
 )
+# Device-side event time, set by the snippet on discovery session callbacks.
+_SESSION_CB_KEY_TIMESTAMP_MS = "timestampMs"
 _MESSAGE_RECEIVED = (
     constants.DiscoverySessionCallbackMethodType.MESSAGE_RECEIVED
 )
 _MESSAGE_SEND_RESULT = (
     constants.DiscoverySessionCallbackMethodType.MESSAGE_SEND_RESULT
 )
+_MESSAGE_SEND_FAILED = (
+    constants.DiscoverySessionCallbackMethodType.MESSAGE_SEND_FAILED
+)
 _NETWORK_CB_KEY_CURRENT_TS = (
     constants.NetworkCbEventKey.NETWORK_CB_KEY_CURRENT_TS
 )
@@ -70,10 +80,25 @@ _ON_AVAILABLE = (
 _SERVICE_DISCOVERED=(
     constants.DiscoverySessionCallbackMethodType.SERVICE_DISCOVERED
 )
+_DISCOVER_RESULT = (
+    constants.DiscoverySessionCallbackMethodType.DISCOVER_RESULT
+)
+_PUBLISH_STARTED = (
+    constants.DiscoverySessionCallbackMethodType.PUBLISH_STARTED
+)
+_SUBSCRIBE_STARTED = (
+    constants.DiscoverySessionCallbackMethodType.SUBSCRIBE_STARTED
+)
 _NETWORK_CB_KEY_NETWORK_SPECIFIER = "network_specifier"
 _NETWORK_CB_LINK_PROPERTIES_CHANGED = (
     constants.NetworkCbName.ON_PROPERTIES_CHANGED)
-_NETWORK_CB_KEY_INTERFACE_NAME = "interfaceName"
+_NETWORK_CB_KEY_INTERFACE_NAME = (
+    constants.NetworkCbEventKey.NETWORK_INTERFACE_NAME)
+_NETWORK_CB_KEY_CALLBACK_NAME = constants.NetworkCbEventKey.CALLBACK_NAME
+_NETWORK_CB_UNAVAILABLE = constants.NetworkCbName.ON_UNAVAILABLE
+_NETWORK_CALLBACK = constants.NetworkCbEventName.NETWORK_CALLBACK
+_ATTACHED = constants.AttachCallBackMethodType.ATTACHED
+_PEER_ID = constants.WifiAwareSnippetParams.PEER_ID
 
 # Aware Data-Path Constants
 _DATA_PATH_INITIATOR = 0
@@ -86,6 +111,197 @@ _SUBSCRIBE_TYPE_PASSIVE = 0
 _SUBSCRIBE_TYPE_ACTIVE = 1
 
 _REQUEST_NETWORK_TIMEOUT_MS = 15 * 1000
+# Serialized Wi-Fi Aware network request without a specifier parcel; copy it
+# before adding the parcel.
+_NETWORK_REQUEST_TEMPLATE = constants.NetworkRequest(
+    transport_type=_TRANSPORT_TYPE_WIFI_AWARE,
+    network_specifier_parcel=None,
+).to_dict()
+
+_DISCOVERY_SERVICE_NAME = "GoogleTestServiceXY"
+
+# Time to wait for a discovery in the discovery latency tests.
+_DISCOVERY_TIMEOUT_SEC = 10
+# Adaptive discovery timeout: number of samples needed before the observed
+# latency distribution is trusted, and the lower bound of the timeout.
+_ADAPTIVE_TIMEOUT_MIN_SAMPLES = 5
+_ADAPTIVE_TIMEOUT_MIN_SEC = 1.0
+
+
+# APIs covered by the latency tests, shared by their @ApiTest annotations.
+# Tuples, so that no test can modify the list seen by the others.
+_AWARE_DISCOVERY_APIS = (
+    'android.net.wifi.aware.WifiAwareManager#attach('
+    'android.net.wifi.aware.AttachCallback,'
+    'android.net.wifi.aware.IdentityChangedListener,'
+    'android.os.Handler)',
+    'android.net.wifi.aware.WifiAwareSession#publish('
+    'android.net.wifi.aware.PublishConfig,'
+    'android.net.wifi.aware.DiscoverySessionCallback,'
+    'android.os.Handler)',
+    'android.net.wifi.aware.WifiAwareSession#subscrible('
+    'android.net.wifi.aware.SubscribeConfig,'
+    'android.net.wifi.aware.DiscoverySessionCallback,'
+    'android.os.Handler)',
+    'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
+    'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
+)
+_AWARE_MESSAGE_APIS = _AWARE_DISCOVERY_APIS + (
+    'android.net.wifi.aware.DiscoverySession#sendMessage(int, byte[])',
+)
+_AWARE_NDP_APIS = (
+    'android.net.wifi.aware.WifiAwareManager#attach('
+    'android.net.wifi.aware.AttachCallback,'
+    'android.net.wifi.aware.IdentityChangedListener,'
+    'android.os.Handler)',
+    'android.net.wifi.aware.WifiAwareSession#publish('
+    'android.net.wifi.aware.PublishConfig,'
+    'android.os.Handler)',
+    'android.net.wifi.aware.WifiAwareSession#subscrible('
+    'android.net.wifi.aware.SubscribeConfig,'
+    'android.os.Handler)',
+    'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
+    'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
+)
+
+# Message latency tests generated on WifiAwarelatencytest, by name suffix.
+_MESSAGE_LATENCY_CASES = {
+    'default_dws': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        csv_name="test_message_latency_default"),
+    'default_dws_instant_mode_2g': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        instant_mode="2G",
+        csv_name="test_message_latency_default_dws_instant_mode_2g"),
+    'default_dws_instant_mode_5g': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        instant_mode="5G",
+        csv_name="test_message_latency_default_dws_instant_mode_5g"),
+    'non_interactive_dws': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_NON_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_NON_INTERACTIVE,
+        csv_name="test_message_latency_non_interactive_dws"),
+}
+# OOB NDP setup latency tests generated on WifiAwarelatencytest.
+_OOB_NDP_LATENCY_CASES = {
+    'default_dws': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        csv_name="test_oob_ndp_latency_default"),
+    'non_interactive_dws': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_NON_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_NON_INTERACTIVE,
+        csv_name="test_oob_ndp_latency_non_interactive"),
+}
+# End-to-end latency tests generated on WifiAwarelatencytest. The CSV file is
+# named after the test. Only the post-attach instant mode cases are skipped on
+# devices without instant communication mode support.
+_E2E_LATENCY_CASES = {
+    'default_dws': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        include_setup=True),
+    'default_dws_instant_mode_2g': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        include_setup=True,
+        instant_mode="2G"),
+    'default_dws_instant_mode_5g': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        include_setup=True,
+        instant_mode="5G"),
+    'post_attach_default_dws': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        include_setup=False),
+    'post_attach_default_dws_instant_mode_2g': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        include_setup=False,
+        instant_mode="2G"),
+    'post_attach_default_dws_instant_mode_5g': dict(
+        dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
+        dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
+        include_setup=False,
+        instant_mode="5G"),
+}
+# Tests that may reuse the attach sessions kept by the previous one.
+_E2E_POST_ATTACH_TESTS = frozenset(
+    f"test_end_to_end_latency_{suffix}"
+    for suffix, case in _E2E_LATENCY_CASES.items()
+    if not case["include_setup"])
+
+
+def _wait_for_event(handler, event_name, timeout):
+    """Waits for an event on the callback handler.
+
+    Returns:
+        The event, or None if it did not arrive within the timeout.
+    """
+    try:
+        return handler.waitAndGet(event_name, timeout)
+    except (queue.Empty, errors.CallbackHandlerTimeoutError):
+        return None
+
+
+def _index_by_callback_name(events):
+    """Maps each callback name to the first event with that name."""
+    index = {}
+    for event in events:
+        index.setdefault(event.data[_CALLBACK_NAME], event)
+    return index
+
+
+def _has_callback(events, name):
+    """Returns True if any of the events carries the given callback name."""
+    return name is not None and any(
+        event.data[_CALLBACK_NAME] == name for event in events)
+
+
+def _explicit_pass_unless_aborted(name, results):
+    """Passes the test, or fails it if a latency loop was aborted."""
+    if any("aborted_after" in key_results
+           for key_results in results.values()):
+        asserts.explicit_fail(
+            f"{name} aborted after consecutive failures", extras=results)
+    asserts.explicit_pass(f"{name} finished", extras=results)
+
+
+def _safe_call(description, func, *args):
+    """Calls func(*args) for best-effort cleanup.
+
+    Errors are logged rather than raised, so that the remaining cleanup
+    still runs.
+
+    Returns:
+        The return value of func, or None if it raised.
+    """
+    try:
+        return func(*args)
+    except Exception as e:
+        logging.warning("Error %s: %s", description, e)
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _discovery_config(is_publish, dtype, instant_mode, service_name):
+    """Returns the discovery config for the given session parameters.
+
+    The config is built once per parameter set and shared between calls, so
+    callers must not modify it.
+    """
+    config = {constants.SERVICE_NAME: service_name}
+    if instant_mode is not None:
+        config[constants.INSTANTMODE_ENABLE] = instant_mode
+    if is_publish:
+        config[constants.PUBLISH_TYPE] = dtype
+    else:
+        config[constants.SUBSCRIBE_TYPE] = dtype
+    return config
 
 
 class WifiAwarelatencytest(base_test.BaseTestClass):
@@ -105,6 +321,22 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     ads: list[android_device.AndroidDevice]
     publisher: android_device.AndroidDevice
     subscriber: android_device.AndroidDevice
+    # Last known Wi-Fi Aware availability, keyed by device serial.
+    _aware_available_cache: dict[str, bool]
+    # DW intervals (2.4GHz, 5GHz) last configured, keyed by device serial.
+    _power_settings_cache: dict[str, tuple[int, int]]
+    # Whether Wi-Fi is known to be on, keyed by device serial.
+    _wifi_on_cache: dict[str, bool]
+    # Wi-Fi Aware state change broadcast handlers, keyed by device serial.
+    _aware_state_handlers: dict[str, callback_handler_v2.CallbackHandlerV2]
+    # Link local IPv6 addresses, keyed by (device serial, interface name).
+    _ipv6_cache: dict[tuple[str, str], str]
+    # Result CSV file paths, keyed by CSV name.
+    _csv_paths: dict[str, str]
+    # Attach session ids kept open across tests, keyed by device serial.
+    _kept_attach_ids: dict[str, str]
+    # Wi-Fi Aware capabilities, keyed by device serial.
+    _capabilities_cache: dict[str, dict]
 
 
 
@@ -118,56 +350,183 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             device.load_snippet(
                 'wifi_aware_snippet', PACKAGE_NAME
             )
-            for permission in RUNTIME_PERMISSIONS:
-                device.adb.shell(['pm', 'grant', PACKAGE_NAME, permission])
+            device.adb.shell(' && '.join(
+                f'pm grant {PACKAGE_NAME} {permission}'
+                for permission in RUNTIME_PERMISSIONS))
             asserts.abort_all_if(
                 not device.wifi_aware_snippet.wifiAwareIsAvailable(),
                 f'{device} Wi-Fi Aware is not available.',
             )
+            self._aware_available_cache[device.serial] = True
+            self._aware_state_handlers[device.serial] = (
+                device.wifi_aware_snippet.wifiAwareMonitorStateChange())
+
+        self._aware_available_cache = {}
+        self._wifi_on_cache = {}
+        self._power_settings_cache = {}
+        self._aware_state_handlers = {}
+        self._ipv6_cache = {}
+        self._csv_paths = {}
+        self._kept_attach_ids = {}
+        self._capabilities_cache = {}
+        # Runs per-device snippet calls for the whole class, so that setup,
+        # teardown and the latency loops do not spin up a new pool each time.
+        self._device_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(2, len(self.ads)),
+            thread_name_prefix='aware-device')
+        # Writes CSV results off the test thread. A single worker keeps the
+        # rows of concurrent DW combinations from interleaving.
+        self._io_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='aware-io')
 
         # Set up devices in parallel.
-        utils.concurrent_exec(
-            setup_device,
-            ((self.publisher,), (self.subscriber,)),
-            max_workers=2,
-            raise_on_exception=True,
-        )
+        self._concurrent_exec(setup_device, [(ad,) for ad in self.ads])
+        # Bug reports take minutes per device; allow skipping them, e.g. when
+        # failing tests are going to be retried anyway.
+        self._skip_bug_reports = self.user_params.get(
+            'skip_bug_reports', False)
+        # The discovery latency only covers the subscribe session, so the
+        # subscriber attach can optionally be kept across iterations.
+        self._discovery_reuse_attach = self.user_params.get(
+            'discovery_reuse_attach', False)
+        # Likewise for the NDP setup latency, which only covers the data path.
+        self._ndp_reuse_attach = self.user_params.get(
+            'ndp_reuse_attach', False)
+        # test_discovery_latency_all_dws can optionally give up on a
+        # discovery after twice the 95th percentile latency seen so far.
+        # This shortens the run but censors the slow tail, so it is off by
+        # default; the censored discoveries are reported separately.
+        self._discovery_adaptive_timeout = self.user_params.get(
+            'discovery_adaptive_timeout', False)
+        # The post-attach end-to-end tests do not measure the attach, so the
+        # attach sessions can optionally be kept across those tests.
+        self._e2e_reuse_attach = self.user_params.get(
+            'e2e_reuse_attach', False)
+        # The NDP and end-to-end latency loops can optionally stop early once
+        # the 95% confidence interval of the mean is within this fraction of
+        # the mean, after at least latency_min_iterations samples.
+        self._target_relative_ci = self.user_params.get(
+            'latency_target_relative_ci')
+        self._min_iterations = self.user_params.get(
+            'latency_min_iterations', 5)
+        # Partial data is kept by default; a broken device can instead abort
+        # these loops after this many consecutive failed iterations.
+        self._max_consecutive_failures = self.user_params.get(
+            'latency_max_consecutive_failures')
+        # Result CSV files can optionally be gzip compressed to cut the size
+        # of the uploaded artifacts.
+        self._csv_suffix = (
+            '.csv.gz' if self.user_params.get('compress_csv', False)
+            else '.csv')
+        # The first attach, discovery and NDP after loading the snippets is
+        # slower than steady state; optionally run one unrecorded cycle so
+        # that the first iteration of the first test is not an outlier. It
+        # runs last, once every attribute it may use is set.
+        if self.user_params.get('latency_warmup', False):
+            self._warmup()
+
+    def teardown_class(self):
+        # The last post-attach end-to-end test leaves its sessions attached.
+        self._release_kept_attach_sessions()
+        self._io_executor.shutdown(wait=True)
+        self._device_executor.shutdown(wait=True)
+
+    def _concurrent_exec(self, func, param_list) -> list:
+        """Runs func over param_list on the class-level device executor.
+
+        Args:
+            func: The function to call.
+            param_list: An iterable of argument tuples, one per call.
+
+        Returns:
+            The return values of the calls, in the order of param_list.
+
+        Raises:
+            The exception of the first failed call in param_list order, once
+            all calls have finished, so that no call outlives this one.
+        """
+        futures = [
+            self._device_executor.submit(func, *params)
+            for params in param_list
+        ]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
 
     def setup_test(self):
-        for ad in self.ads:
-            autils.control_wifi(ad, True)
+        # Kept attach sessions would hand an already formed cluster to the
+        # tests after the post-attach end-to-end ones.
+        if self.current_test_info.name not in _E2E_POST_ATTACH_TESTS:
+            self._release_kept_attach_sessions()
+        # Aware may have been re-enabled with new data interface addresses.
+        self._ipv6_cache.clear()
+        self._concurrent_exec(
+            self._setup_test_on_device, [(ad,) for ad in self.ads])
+
+    def _setup_test_on_device(
+            self, ad: android_device.AndroidDevice) -> None:
+        # The previous test may have reset or changed the DW configuration.
+        self._power_settings_cache.pop(ad.serial, None)
+        state_handler = self._aware_state_handlers[ad.serial]
+        state_handler.getAll(
+            constants.WifiAwareBroadcast.WIFI_AWARE_AVAILABLE)
+        if state_handler.getAll(
+                constants.WifiAwareBroadcast.WIFI_AWARE_NOT_AVAILABLE):
+            # Aware went down since the last test, e.g. Wi-Fi was toggled.
+            self._wifi_on_cache.pop(ad.serial, None)
+            self._aware_available_cache.pop(ad.serial, None)
+            self._kept_attach_ids.pop(ad.serial, None)
+        if not self._wifi_on_cache.get(ad.serial):
+            if autils.control_wifi(ad, True):
+                # Aware availability follows Wi-Fi, query it again.
+                self._aware_available_cache.pop(ad.serial, None)
+            self._wifi_on_cache[ad.serial] = True
+        aware_avail = self._aware_available_cache.get(ad.serial)
+        if aware_avail is None:
             aware_avail = ad.wifi_aware_snippet.wifiAwareIsAvailable()
-            ad.wifi_aware_snippet.wifiAwareCloseAllWifiAwareSession()
-            if not aware_avail:
-                ad.log.info('Aware not available. Waiting ...')
-                state_handler = (
-                    ad.wifi_aware_snippet.wifiAwareMonitorStateChange())
-                state_handler.waitAndGet(
-                    constants.WifiAwareBroadcast.WIFI_AWARE_AVAILABLE)
+        self._close_all_sessions(ad)
+        if not aware_avail:
+            ad.log.info('Aware not available. Waiting ...')
+            state_handler.waitAndGet(
+                constants.WifiAwareBroadcast.WIFI_AWARE_AVAILABLE)
+        self._aware_available_cache[ad.serial] = True
 
     def teardown_test(self):
-        utils.concurrent_exec(
-            self._teardown_test_on_device,
-            ((self.publisher,), (self.subscriber,)),
-            max_workers=2,
-            raise_on_exception=True,
-        )
-        utils.concurrent_exec(
-            lambda d: d.services.create_output_excerpts_all(
-                self.current_test_info),
-            param_list=[[ad] for ad in self.ads],
-            raise_on_exception=True,
-        )
+        # One fan-out per device, so that a device does not wait for the
+        # others' cleanup before creating its excerpts.
+        self._concurrent_exec(
+            self._teardown_test_on_device, [(ad,) for ad in self.ads])
 
     def _teardown_test_on_device(
             self, ad: android_device.AndroidDevice) -> None:
-        ad.wifi_aware_snippet.wifiAwareCloseAllWifiAwareSession()
+        self._close_all_sessions(ad)
         ad.wifi_aware_snippet.connectivityReleaseAllSockets()
         if ad.is_adb_root:
-          autils.reset_device_parameters(ad)
-          autils.reset_device_statistics(ad)
+          autils.reset_device_parameters_and_statistics(ad)
+        ad.services.create_output_excerpts_all(self.current_test_info)
+
+    def _close_all_sessions(self, ad: android_device.AndroidDevice) -> None:
+        """Closes all Aware sessions on the device except the kept attach."""
+        kept_id = self._kept_attach_ids.get(ad.serial)
+        ad.wifi_aware_snippet.wifiAwareCloseAllWifiAwareSession(
+            [kept_id] if kept_id else None)
+
+    def _release_kept_attach_sessions(self) -> None:
+        """Detaches the attach sessions kept across post-attach tests."""
+        kept = [(ad, self._kept_attach_ids.pop(ad.serial))
+                for ad in self.ads if ad.serial in self._kept_attach_ids]
+        self._concurrent_exec(
+            lambda ad, session_id: _safe_call(
+                "detaching kept attach session",
+                ad.wifi_aware_snippet.wifiAwareDetach, session_id),
+            kept)
 
     def on_fail(self, record: records.TestResult) -> None:
+        # Do not carry attach sessions of a failed test into the next one.
+        self._kept_attach_ids.clear()
+        if self._skip_bug_reports:
+            logging.info('Skipping bug reports for %s.', record.test_name)
+            return
+        # Reports are captured on all devices concurrently.
         android_device.take_bug_reports(self.ads,
                                         destination =
                                         self.current_test_info.output_path)
@@ -176,7 +535,7 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         """Starts the attach process on the provided device."""
         handler = ad.wifi_aware_snippet.wifiAwareAttach()
         attach_event = handler.waitAndGet(
-            event_name = constants.AttachCallBackMethodType.ATTACHED,
+            event_name = _ATTACHED,
             timeout = _DEFAULT_TIMEOUT,
         )
         asserts.assert_true(
@@ -186,7 +545,93 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         ad.log.info('Attach Wi-Fi Aware session succeeded.')
         return attach_event.callback_id
 
-    def start_discovery_session(self, dut, session_id, is_publish, dtype, instant_mode = None):
+    def _skip_unless_instant_mode_supported(self) -> None:
+        """Skips the test unless publisher and subscriber support instant mode.
+
+        The capabilities do not change during the run, so they are queried
+        once per device, concurrently. The skip names the first device
+        lacking support.
+        """
+        ads = [ad for ad in (self.publisher, self.subscriber)
+               if ad.serial not in self._capabilities_cache]
+        for ad, capabilities in zip(ads, self._concurrent_exec(
+                autils.get_aware_capabilities, [(ad,) for ad in ads])):
+            self._capabilities_cache[ad.serial] = capabilities
+        for ad in (self.publisher, self.subscriber):
+            asserts.skip_if(
+                not self._capabilities_cache[ad.serial][
+                    "isInstantCommunicationModeSupported"],
+                f"{ad} doesn't support instant communication mode")
+
+    def _converged(self, stats, min_iters, target_relative_ci) -> bool:
+        """Returns whether a latency loop can stop before its last iteration.
+
+        Args:
+            stats: autils.RunningStats of the samples so far.
+            min_iters: Minimum number of samples.
+            target_relative_ci: Relative 95% confidence interval half-width to
+                reach, or None to always run every iteration.
+        """
+        if target_relative_ci is None or stats.count < min_iters:
+            return False
+        relative_ci = stats.relative_ci_half_width()
+        if relative_ci >= target_relative_ci:
+            return False
+        logging.info(
+            "Stopping after %d samples: relative 95%% CI %.3f < %.3f",
+            stats.count, relative_ci, target_relative_ci)
+        return True
+
+    def _csv_path(self, csv_name: str) -> str:
+        """Returns the path of the result CSV file with the given name."""
+        path = self._csv_paths.get(csv_name)
+        if path is None:
+            path = self._csv_paths[csv_name] = os.path.join(
+                self.log_path, csv_name + self._csv_suffix)
+        return path
+
+    def _cdf_path(self, key: str) -> str:
+        """Returns the path of the CDF file of a result key of this test."""
+        return os.path.join(
+            self.log_path,
+            f"{self.current_test_info.name}_{key}_cdf{self._csv_suffix}")
+
+    def _samples_path(self, key: str) -> str:
+        """Returns the path of the samples file of a result key of this test."""
+        return os.path.join(
+            self.log_path,
+            f"{self.current_test_info.name}_{key}_samples{self._csv_suffix}")
+
+    def _config_power_settings(
+            self, ads: Sequence[android_device.AndroidDevice], dw_24ghz: int,
+            dw_5ghz: int) -> None:
+        """Configures the DW intervals on the given devices concurrently.
+
+        Devices already configured with these intervals during the current
+        test are skipped.
+        """
+        ads = [ad for ad in ads
+               if self._power_settings_cache.get(ad.serial)
+               != (dw_24ghz, dw_5ghz)]
+        self._concurrent_exec(
+            autils.config_power_settings,
+            [(ad, dw_24ghz, dw_5ghz) for ad in ads])
+        for ad in ads:
+            self._power_settings_cache[ad.serial] = (dw_24ghz, dw_5ghz)
+
+    def _close_session_and_detach(
+            self, ad: android_device.AndroidDevice, disc_id: str,
+            session_id: str | None) -> None:
+        """Closes the discovery session and detaches the Aware session.
+
+        Both are done in a single snippet call. The Aware session is kept
+        attached if session_id is None.
+        """
+        ad.wifi_aware_snippet.wifiAwareCloseSessionAndDetach(
+            disc_id, session_id)
+
+    def start_discovery_session(self, dut, session_id, is_publish, dtype, instant_mode = None,
+                                service_name=_DISCOVERY_SERVICE_NAME):
         """Start a discovery session
 
         Args:
@@ -195,42 +640,78 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             is_publish: True for a publish session, False for subscribe session
             dtype: Type of the discovery session
             instant_mode: set the channel to use instant communication mode.
+            service_name: Name of the published or subscribed service.
 
         Returns:
         Discovery session started event.
         """
-        config = {}
-        config[constants.SERVICE_NAME] ="GoogleTestServiceXY"
-        if instant_mode is not None:
-            config[constants.INSTANTMODE_ENABLE] = instant_mode
+        config = _discovery_config(
+            is_publish, dtype, instant_mode, service_name)
         if is_publish:
-            config[constants.PUBLISH_TYPE] = dtype
             disc_id = dut.wifi_aware_snippet.wifiAwarePublish(
                 session_id, config
             )
-            discovery = disc_id.waitAndGet(
-                constants.DiscoverySessionCallbackMethodType.DISCOVER_RESULT)
-            callback_name = discovery.data[_CALLBACK_NAME]
-            asserts.assert_equal(
-                constants.DiscoverySessionCallbackMethodType.PUBLISH_STARTED,
-                callback_name,
-                f'{dut} publish failed, got callback: {callback_name}.',
-            )
+            expected_callback = _PUBLISH_STARTED
         else:
-            config[constants.SUBSCRIBE_TYPE] = dtype
             disc_id = dut.wifi_aware_snippet.wifiAwareSubscribe(
                 session_id, config
             )
-            discovery = disc_id.waitAndGet(
-                constants.DiscoverySessionCallbackMethodType.DISCOVER_RESULT)
-            callback_name = discovery.data[_CALLBACK_NAME]
-            asserts.assert_equal(
-                constants.DiscoverySessionCallbackMethodType.SUBSCRIBE_STARTED,
-                callback_name,
-                f'{dut} subscribe failed, got callback: {callback_name}.',
-            )
+            expected_callback = _SUBSCRIBE_STARTED
+        discovery = disc_id.waitAndGet(_DISCOVER_RESULT)
+        callback_name = discovery.data[_CALLBACK_NAME]
+        # Only build the failure message when the session did not start.
+        if callback_name != expected_callback:
+            asserts.fail(
+                f'{dut} {"publish" if is_publish else "subscribe"} failed, '
+                f'got callback: {callback_name}.')
         return disc_id, discovery
 
+    def _wait_for_publisher_ready(self, s_dut, s_type, max_wait_s=10,
+                                  service_name=_DISCOVERY_SERVICE_NAME):
+        """Waits until the publisher can be discovered by the subscriber.
+
+        Runs a probe subscribe session on the subscriber and returns as soon
+        as the publisher is discovered, instead of sleeping for a fixed time.
+
+        Args:
+            s_dut: Subscriber device.
+            s_type: Type of the probe subscribe session.
+            max_wait_s: Maximum time (in seconds) to wait for the publisher.
+            service_name: Name of the published service.
+        """
+        s_id = self._start_attach(s_dut)
+        try:
+            s_disc_id, _ = self.start_discovery_session(
+                s_dut, s_id, False, s_type, service_name=service_name)
+        except Exception:
+            s_dut.wifi_aware_snippet.wifiAwareDetach(s_id)
+            raise
+        try:
+            if _wait_for_event(
+                    s_disc_id, _SERVICE_DISCOVERED, max_wait_s) is None:
+                s_dut.log.info(
+                    "[Subscriber] Publisher not discovered within %ss, "
+                    "continuing.", max_wait_s)
+        finally:
+            self._close_session_and_detach(
+                s_dut, s_disc_id.callback_id, s_id)
+
+    def _discovery_timeout(self, latencies, timeout_period, strict_timeout):
+        """Returns the timeout (in seconds) for the next discovery wait.
+
+        Args:
+            latencies: Discovery latencies (in ms) observed so far.
+            timeout_period: Maximum timeout (in seconds).
+            strict_timeout: True to always use timeout_period. Otherwise, once
+                            enough samples are collected, give up after twice
+                            the observed 95th percentile latency.
+        """
+        if strict_timeout or len(latencies) < _ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return timeout_period
+        p95_ms = statistics.quantiles(latencies, n=20)[-1]
+        return min(timeout_period,
+                   max(2 * p95_ms / 1000, _ADAPTIVE_TIMEOUT_MIN_SEC))
+
     def run_synchronization_latency(self, results, do_unsolicited_passive,
                                     dw_24ghz, dw_5ghz, num_iterations,
                                     startup_offset, timeout_period):
@@ -250,65 +731,70 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         startup_offset: The start-up gap (in seconds) between the two devices
         timeout_period: Time period over which to measure synchronization
         """
-        key = "%s_dw24_%d_dw5_%d_offset_%d" % ("unsolicited_passive"
-                                               if do_unsolicited_passive else
-                                               "solicited_active", dw_24ghz,
-                                               dw_5ghz, startup_offset)
-        results[key] = {}
-        results[key]["num_iterations"] = num_iterations
+        # Evaluate the discovery mode once for the keys, labels and types.
+        if do_unsolicited_passive:
+            mode_key, mode_label = "unsolicited_passive", "Unsolicited/Passive"
+            p_type, s_type = _PUBLISH_TYPE_UNSOLICITED, _SUBSCRIBE_TYPE_PASSIVE
+        else:
+            mode_key, mode_label = "solicited_active", "Solicited/Active"
+            p_type, s_type = _PUBLISH_TYPE_SOLICITED, _SUBSCRIBE_TYPE_ACTIVE
+        key = "%s_dw24_%d_dw5_%d_offset_%d" % (
+            mode_key, dw_24ghz, dw_5ghz, startup_offset)
+        log_prefix = "Subscribe Session Sync/Discovery (%s, dw24=%d, dw5=%d)" % (
+            mode_label, dw_24ghz, dw_5ghz)
+        results[key] = {"num_iterations": num_iterations}
         self.publisher.pretty_name = "Publisher"
         self.subscriber.pretty_name ="Subscriber"
-        autils.config_power_settings(self.publisher, dw_24ghz, dw_5ghz)
-        autils.config_power_settings(self.subscriber, dw_24ghz, dw_5ghz)
+        self._config_power_settings((self.publisher, self.subscriber), dw_24ghz, dw_5ghz)
         latencies = []
         failed_discoveries = 0
         for i in range(num_iterations):
             # Publisher+Subscriber: attach and wait for confirmation
-            p_id = self._start_attach(self.publisher)
-            s_id = self._start_attach(self.subscriber)
-            # start publish
+            p_id, s_id = self._concurrent_exec(
+                self._start_attach, ((self.publisher,), (self.subscriber,)))
+            # start publish, then subscribe: the latency is measured from the
+            # subscribe start, so it must not include the publish start
             p_disc_id, p_disc_event = self.start_discovery_session(
-                self.publisher, p_id, True, _PUBLISH_TYPE_UNSOLICITED
-                if do_unsolicited_passive else _PUBLISH_TYPE_SOLICITED)
-            # start subscribe
+                self.publisher, p_id, True, p_type)
             s_disc_id, s_session_event = self.start_discovery_session(
-                self.subscriber, s_id, False, _SUBSCRIBE_TYPE_PASSIVE
-                if do_unsolicited_passive else _SUBSCRIBE_TYPE_ACTIVE)
+                self.subscriber, s_id, False, s_type)
+            s_session_ts = s_session_event.data[_SESSION_CB_KEY_TIMESTAMP_MS]
             # wait for discovery (allow for failures here since running lots of
             # samples and would like to get the partial data even in the presence of
             # errors)
             try:
-                discovered_event = s_disc_id.waitAndGet(
-                    _SERVICE_DISCOVERED,
-                    timeout_period)
-                logging.info(
-                    "[Subscriber] SESSION_CB_ON_SERVICE_DISCOVERED: %s",
-                    discovered_event.data)
-            except queue.Empty:
+                discovered_event = _wait_for_event(
+                    s_disc_id, _SERVICE_DISCOVERED, timeout_period)
+            finally:
+                self._concurrent_exec(
+                    self._close_session_and_detach,
+                    ((self.publisher, p_disc_id.callback_id, p_id),
+                     (self.subscriber, s_disc_id.callback_id, s_id)))
+            if discovered_event is None:
                 failed_discoveries = failed_discoveries + 1
                 continue
-            finally:
-                self.publisher.wifi_aware_snippet.wifiAwareDetach(p_id)
-                self.subscriber.wifi_aware_snippet.wifiAwareDetach(s_id)
-                self.publisher.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-                    p_disc_id.callback_id)
-                self.subscriber.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-                    s_disc_id.callback_id)
+            logging.info(
+                "[Subscriber] SESSION_CB_ON_SERVICE_DISCOVERED: %s",
+                discovered_event.data)
             # collect latency information
             latencies.append(
-                discovered_event.data["timestampMs"] - s_session_event.data["timestampMs"]
-            )
+                discovered_event.data[_SESSION_CB_KEY_TIMESTAMP_MS]
+                - s_session_ts)
         autils.extract_stats(self.subscriber,
                              data=latencies,
                              results=results[key],
                              key_prefix="",
-                             log_prefix="Subscribe Session Sync/Discovery (%s, dw24=%d, dw5=%d)"
-                                        % ("Unsolicited/Passive" if do_unsolicited_passive else
-                                           "Solicited/Active", dw_24ghz, dw_5ghz))
+                             log_prefix=log_prefix,
+                             io_executor=self._io_executor,
+                             cdf_filepath=self._cdf_path(key),
+                             samples_filepath=self._samples_path(key))
         results[key]["num_failed_discovery"] = failed_discoveries
 
     def run_discovery_latency(self, results, do_unsolicited_passive, dw_24ghz,
-                              dw_5ghz, num_iterations, csv_name="latency_test"):
+                              dw_5ghz, num_iterations, csv_name="latency_test",
+                              p_dut=None, s_dut=None, strict_timeout=True,
+                              reuse_attach=False, csv_rows=None,
+                              service_name=_DISCOVERY_SERVICE_NAME):
         """Run the service discovery latency test with the specified DW intervals.
 
         Args:
@@ -320,67 +806,96 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             dw_5ghz: DW interval in the 5GHz band.
             num_iterations: number of the iterations.
             csv_name: csv file test result name.
+            p_dut: Publisher device, defaults to the class publisher.
+            s_dut: Subscriber device, defaults to the class subscriber.
+            strict_timeout: False to shorten the discovery timeout based on
+                            the latencies observed so far. Discoveries timed
+                            out by a shortened timeout are counted as
+                            "num_censored_discovery".
+            reuse_attach: True to attach the subscriber once and only restart
+                          its subscribe session on each iteration.
+            csv_rows: If set, the CSV row is appended to this list instead of
+                      being written to the csv_name file.
+            service_name: Name of the discovered service. Runs sharing the
+                          air at the same time need distinct names, so that
+                          a subscriber cannot match another run's publisher.
         """
-        key = "%s_dw24_%d_dw5_%d" % ("unsolicited_passive"
-                                     if do_unsolicited_passive else
-                                     "solicited_active", dw_24ghz, dw_5ghz)
-        results[key] = {}
-        results[key]["num_iterations"] = num_iterations
-        p_dut = self.ads[0]
+        # Evaluate the discovery mode once for the keys, labels and types.
+        if do_unsolicited_passive:
+            mode_key, mode_label = "unsolicited_passive", "Unsolicited/Passive"
+            p_type, s_type = _PUBLISH_TYPE_UNSOLICITED, _SUBSCRIBE_TYPE_PASSIVE
+        else:
+            mode_key, mode_label = "solicited_active", "Solicited/Active"
+            p_type, s_type = _PUBLISH_TYPE_SOLICITED, _SUBSCRIBE_TYPE_ACTIVE
+        key = "%s_dw24_%d_dw5_%d" % (mode_key, dw_24ghz, dw_5ghz)
+        log_prefix = "Subscribe Session Sync/Discovery (%s, dw24=%d, dw5=%d)" % (
+            mode_label, dw_24ghz, dw_5ghz)
+        results[key] = {"num_iterations": num_iterations}
+        p_dut = p_dut or self.publisher
         p_dut.pretty_name = "Publisher"
-        s_dut = self.ads[1]
+        s_dut = s_dut or self.subscriber
         s_dut.pretty_name ="Subscriber"
         # override the default DW configuration
-        autils.config_power_settings(p_dut, dw_24ghz, dw_5ghz)
-        autils.config_power_settings(s_dut, dw_24ghz, dw_5ghz)
+        self._config_power_settings((p_dut, s_dut), dw_24ghz, dw_5ghz)
         # Publisher+Subscriber: attach and wait for confirmation
         p_id = self._start_attach(p_dut)
         # start publish
         p_disc_id, p_disc_event = self.start_discovery_session(
-            self.publisher, p_id, True, _PUBLISH_TYPE_UNSOLICITED
-            if do_unsolicited_passive else _PUBLISH_TYPE_SOLICITED)
-        time.sleep(10)
+            p_dut, p_id, True, p_type, service_name=service_name)
+        self._wait_for_publisher_ready(
+            s_dut, s_type, service_name=service_name)
         # loop, perform discovery, and collect latency information
         latencies = []
         failed_discoveries = 0
-        for i in range(num_iterations):
+        censored_discoveries = 0
+        if reuse_attach:
             s_id = self._start_attach(s_dut)
+        for i in range(num_iterations):
+            if not reuse_attach:
+                s_id = self._start_attach(s_dut)
             s_disc_id, s_session_event = self.start_discovery_session(
-                self.subscriber, s_id, False, _SUBSCRIBE_TYPE_PASSIVE
-                if do_unsolicited_passive else _SUBSCRIBE_TYPE_ACTIVE)
+                s_dut, s_id, False, s_type, service_name=service_name)
+            s_session_ts = s_session_event.data[_SESSION_CB_KEY_TIMESTAMP_MS]
+            timeout = self._discovery_timeout(
+                latencies, _DISCOVERY_TIMEOUT_SEC, strict_timeout)
             try:
-                discovered_event = s_disc_id.waitAndGet(
-                    _SERVICE_DISCOVERED,
-                    10)
-                logging.info(
-                    "[Subscriber] SESSION_CB_ON_SERVICE_DISCOVERED: %s",
-                    discovered_event.data)
-            except queue.Empty:
+                discovered_event = _wait_for_event(
+                    s_disc_id, _SERVICE_DISCOVERED, timeout)
+            finally:
+                self._close_session_and_detach(
+                    s_dut, s_disc_id.callback_id,
+                    None if reuse_attach else s_id)
+            if discovered_event is None:
                 failed_discoveries = failed_discoveries + 1
+                if timeout < _DISCOVERY_TIMEOUT_SEC:
+                    # Might have been discovered within the full timeout.
+                    censored_discoveries = censored_discoveries + 1
                 continue
-            finally:
-                self.subscriber.wifi_aware_snippet.wifiAwareDetach(s_id)
+            logging.info(
+                "[Subscriber] SESSION_CB_ON_SERVICE_DISCOVERED: %s",
+                discovered_event.data)
 
             # collect latency information
             latencies.append(
-                discovered_event.data["timestampMs"] - s_session_event.data["timestampMs"]
-            )
-            s_dut.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-                s_disc_id.callback_id)
-        filename = f"{csv_name}.csv"
-        output_file = os.path.join(self.log_path, filename)
+                discovered_event.data[_SESSION_CB_KEY_TIMESTAMP_MS]
+                - s_session_ts)
+        if reuse_attach:
+            s_dut.wifi_aware_snippet.wifiAwareDetach(s_id)
+        output_file = self._csv_path(csv_name)
         autils.extract_stats(s_dut,
                              data=latencies,
                              results=results[key],
                              key_prefix="",
-                             log_prefix="Subscribe Session Sync/Discovery (%s, dw24=%d, dw5=%d)"
-                                        % ("Unsolicited/Passive" if do_unsolicited_passive else
-                                           "Solicited/Active", dw_24ghz, dw_5ghz),
-                             csv_filepath=output_file)
+                             log_prefix=log_prefix,
+                             csv_filepath=output_file,
+                             io_executor=self._io_executor,
+                             csv_rows=csv_rows,
+                             cdf_filepath=self._cdf_path(key),
+                             samples_filepath=self._samples_path(key))
         results[key]["num_failed_discovery"] = failed_discoveries
+        results[key]["num_censored_discovery"] = censored_discoveries
         logging.info("How many times for failed discovery %s times", failed_discoveries)
-        p_dut.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-            p_disc_id.callback_id)
+        self._close_session_and_detach(p_dut, p_disc_id.callback_id, p_id)
 
     def get_next_msg_id(self):
         """Increment the message ID and returns the new value. Guarantees that
@@ -407,15 +922,13 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             csv_name: csv file test result name.
         """
         key = "dw24_%d_dw5_%d" % (dw_24ghz, dw_5ghz)
-        results[key] = {}
-        results[key]["num_iterations"] = num_iterations
+        results[key] = {"num_iterations": num_iterations}
         p_dut = self.ads[0]
         p_dut.pretty_name = "Publisher"
         s_dut = self.ads[1]
         s_dut.pretty_name ="Subscriber"
         # override the default DW configuration
-        autils.config_power_settings(p_dut, dw_24ghz, dw_5ghz)
-        autils.config_power_settings(s_dut, dw_24ghz, dw_5ghz)
+        self._config_power_settings((p_dut, s_dut), dw_24ghz, dw_5ghz)
         # Start up a discovery session
         (p_id, s_id, p_disc_id, s_disc_id,
          peer_id_on_sub) = autils.create_discovery_pair(
@@ -435,44 +948,62 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         messages_rx = 0
         missing_rx = 0
         corrupted_rx = 0
+        # Messages whose Tx succeeded and which the publisher has yet to
+        # receive.
+        pending_rx = set()
+        # Resolved once; each snippet attribute access builds a new RPC stub.
+        send_message = s_dut.wifi_aware_snippet.wifiAwareSendMessage
+        s_disc_callback_id = s_disc_id.callback_id
         for i in range(num_iterations):
             # send message
             msg_s2p = "Message Subscriber -> Publisher #%d" % i
             next_msg_id = self.get_next_msg_id()
-            s_dut.wifi_aware_snippet.wifiAwareSendMessage(
-                s_disc_id.callback_id, peer_id_on_sub, next_msg_id, msg_s2p
+            send_message(
+                s_disc_callback_id, peer_id_on_sub, next_msg_id, msg_s2p
             )
-            time.sleep(5)
-            # wait for Tx confirmation
-            try:
-                sub_tx_msg_event = s_disc_id.waitAndGet(
-                    event_name =_MESSAGE_SEND_RESULT,
-                    timeout =_DEFAULT_TIMEOUT,
-                )
-                latencies.append(sub_tx_msg_event.data[
-                                     _SESSION_CB_KEY_LATENCY_MS])
-            except queue.Empty:
+            # wait for Tx confirmation; the snippet reports the latency, so
+            # there is no need to pad the send with a sleep. Only one message
+            # is in flight at a time so that the latency does not include
+            # queueing behind earlier messages.
+            sub_tx_msg_event = _wait_for_event(
+                s_disc_id, _MESSAGE_SEND_RESULT, _DEFAULT_TIMEOUT)
+            if sub_tx_msg_event is None:
                 s_dut.log.info("[Subscriber] Timed out while waiting for "
                                "SESSION_CB_ON_MESSAGE_SENT")
                 failed_tx = failed_tx + 1
                 continue
-            # wait for Rx confirmation (and validate contents)
-            try:
-                pub_rx_msg_event = p_disc_id.waitAndGet(
-                    event_name = _MESSAGE_RECEIVED,
-                    timeout = _DEFAULT_TIMEOUT,
-                )
-                messages_rx = messages_rx + 1
-                if (pub_rx_msg_event.data[
-                    _SESSION_CB_KEY_MESSAGE_AS_STRING] != msg_s2p):
-                    corrupted_rx = corrupted_rx + 1
-            except queue.Empty:
-                s_dut.log.info("[Publisher] Timed out while waiting for "
-                               "SESSION_CB_ON_MESSAGE_RECEIVED")
-                missing_rx = missing_rx + 1
+            if (sub_tx_msg_event.data[_CALLBACK_NAME]
+                    == _MESSAGE_SEND_FAILED):
+                s_dut.log.info("[Subscriber] Failed to send message #%d", i)
+                failed_tx = failed_tx + 1
                 continue
-        filename = f"{csv_name}.csv"
-        output_file = os.path.join(self.log_path, filename)
+            latencies.append(sub_tx_msg_event.data[
+                                 _SESSION_CB_KEY_LATENCY_MS])
+            pending_rx.add(msg_s2p)
+        # The publisher receives a message before the subscriber gets its Tx
+        # confirmation, so the Rx events are collected in one go instead of
+        # after every message. Wait only for stragglers.
+        rx_events = p_disc_id.getAll(_MESSAGE_RECEIVED)
+        while pending_rx and len(rx_events) < len(pending_rx):
+            pub_rx_msg_event = _wait_for_event(
+                p_disc_id, _MESSAGE_RECEIVED, _DEFAULT_TIMEOUT)
+            if pub_rx_msg_event is None:
+                break
+            rx_events.append(pub_rx_msg_event)
+        # validate Rx contents
+        for pub_rx_msg_event in rx_events:
+            messages_rx = messages_rx + 1
+            msg_rx = pub_rx_msg_event.data[_SESSION_CB_KEY_MESSAGE_AS_STRING]
+            if msg_rx in pending_rx:
+                pending_rx.remove(msg_rx)
+            else:
+                corrupted_rx = corrupted_rx + 1
+        # Each corrupted message stands in for one of the pending ones.
+        missing_rx = max(len(pending_rx) - corrupted_rx, 0)
+        if missing_rx:
+            p_dut.log.info("[Publisher] Timed out while waiting for "
+                           "SESSION_CB_ON_MESSAGE_RECEIVED")
+        output_file = self._csv_path(csv_name)
         autils.extract_stats(
             s_dut,
             data=latencies,
@@ -480,15 +1011,18 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             key_prefix="",
             log_prefix="Subscribe Session Discovery (dw24=%d, dw5=%d)" %
                        (dw_24ghz, dw_5ghz),
-            csv_filepath=output_file)
+            csv_filepath=output_file,
+            io_executor=self._io_executor,
+            cdf_filepath=self._cdf_path(key),
+            samples_filepath=self._samples_path(key))
         results[key]["failed_tx"] = failed_tx
         results[key]["messages_rx"] = messages_rx
         results[key]["missing_rx"] = missing_rx
         results[key]["corrupted_rx"] = corrupted_rx
-        p_dut.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-            p_disc_id.callback_id)
-        s_dut.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-            s_disc_id.callback_id)
+        self._concurrent_exec(
+            self._close_session_and_detach,
+            ((p_dut, p_disc_id.callback_id, p_id),
+             (s_dut, s_disc_id.callback_id, s_id)))
 
     def attach_with_identity(self, dut):
         """Start an Aware session (attach) and wait for confirmation and
@@ -500,11 +1034,10 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             id: Aware session ID.
         mac: Discovery MAC address of this device.
         """
-        handler = dut.wifi_aware_snippet.wifiAwareAttached(True)
-        dut_id = handler.waitAndGet(constants.AttachCallBackMethodType.ATTACHED)
-        even = handler.waitAndGet(constants.AttachCallBackMethodType.ID_CHANGED)
-        mac = even.data["mac"]
-        return dut_id.callback_id, mac
+        # Attach and both callbacks are handled in a single snippet RPC.
+        identity = dut.wifi_aware_snippet.wifiAwareAttachAndGetIdentity(
+            int(_DEFAULT_TIMEOUT * 1000))
+        return identity["sessionId"], identity["mac"]
 
     def request_oob_network(
             self,
@@ -523,7 +1056,7 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         )
         network_request_dict = constants.NetworkRequest(
             transport_type=(
-                constants.NetworkCapabilities.Transport.TRANSPORT_WIFI_AWARE),
+                _TRANSPORT_TYPE_WIFI_AWARE),
             network_specifier_parcel=network_specifier_parcel["result"],
         ).to_dict()
         return ad.wifi_aware_snippet.connectivityRequestNetwork(
@@ -532,9 +1065,31 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             _REQUEST_NETWORK_TIMEOUT_MS
         )
 
+    def _cleanup_ndp_iteration(
+            self, ad: android_device.AndroidDevice, network_id: str | None,
+            session_id: str | None, iteration: int) -> None:
+        """Unregisters the network and detaches Aware after an NDP iteration.
+
+        Errors are logged rather than raised, so that the remaining cleanup
+        and the next iterations still run.
+        """
+        if network_id:
+            _safe_call(
+                "unregistering network on %s in iteration %d" % (
+                    ad.pretty_name, iteration),
+                ad.wifi_aware_snippet.connectivityUnregisterNetwork,
+                network_id)
+        if session_id:
+            _safe_call(
+                "detaching Aware on %s in iteration %d" % (
+                    ad.pretty_name, iteration),
+                ad.wifi_aware_snippet.wifiAwareDetach, session_id)
+
     def run_ndp_oob_latency(
             self, results, dw_24ghz, dw_5ghz,
-            num_iterations, csv_name="latency_test"):
+            num_iterations, csv_name="latency_test", reuse_attach=False,
+            min_iters=5, target_relative_ci=None,
+            max_consecutive_failures=None):
         """Runs the NDP setup with OOB (out-of-band) discovery latency test.
 
         Args:
@@ -543,158 +1098,182 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         dw_5ghz: DW interval in the 5GHz band.
         num_iterations: number of the iterations.
         csv_name: csv file test result name.
+        reuse_attach: True to attach both devices once and only set up and
+                      tear down the data path on each iteration.
+        min_iters: Minimum number of onAvailable samples before stopping early.
+        target_relative_ci: If set, stop before num_iterations once the
+                            relative 95% CI of the onAvailable latency is
+                            below this value.
+        max_consecutive_failures: If set, stop after this many consecutive
+                                  failed NDP setups and record the iteration
+                                  count as "aborted_after".
         """
         key_avail = "on_avail_dw24_%d_dw5_%d" % (dw_24ghz, dw_5ghz)
         key_link_props = "link_props_dw24_%d_dw5_%d" % (dw_24ghz, dw_5ghz)
-        results[key_avail] = {}
+        results[key_avail] = {"num_iterations": num_iterations}
         results[key_link_props] = {}
-        results[key_avail]["num_iterations"] = num_iterations
         p_dut = self.ads[0]
         p_dut.pretty_name = "Publisher"
         s_dut = self.ads[1]
         s_dut.pretty_name ="Subscriber"
         # override the default DW configuration
-        autils.config_power_settings(p_dut, dw_24ghz, dw_5ghz)
-        autils.config_power_settings(s_dut, dw_24ghz, dw_5ghz)
-
-        time.sleep(10)
-        on_available_latencies = []
-        link_props_latencies = []
+        self._config_power_settings((p_dut, s_dut), dw_24ghz, dw_5ghz)
+        # No settle time is needed for the new DW configuration: every
+        # iteration waits for the attach and identity callbacks before
+        # requesting the network.
+        # Filled in order of arrival, at most one sample per iteration each.
+        on_available_latencies = [0] * num_iterations
+        link_props_latencies = [0] * num_iterations
+        num_on_available = 0
+        num_link_props = 0
+        on_available_stats = autils.RunningStats()
         ndp_setup_failures = 0
+        consecutive_failures = 0
+        iterations = 0
+        if reuse_attach:
+            ((p_id, p_mac), (s_id, s_mac)) = self._concurrent_exec(
+                self.attach_with_identity, ((p_dut,), (s_dut,)))
+            time.sleep(self.WAIT_FOR_CLUSTER) # Wait for devices to be ready
+        # Resolved once; each snippet attribute access builds a new RPC stub.
+        server_socket_accept = (
+            p_dut.wifi_aware_snippet.connectivityServerSocketAccept)
         for i in range(num_iterations):
-            p_id, s_id = None,None
+            if not reuse_attach:
+                p_id, s_id = None,None
             network_id = None
             s_req_key, p_req_key = None, None
-            logging.info(f"OOB NDP Latency Iteration {i+1}/{num_iterations}")
+            iterations += 1
+            logging.info("OOB NDP Latency Iteration %d/%d", i + 1,
+                         num_iterations)
             try:
-                p_id, p_mac = self.attach_with_identity(p_dut)
-                s_id, s_mac = self.attach_with_identity(s_dut)
-                logging.info(f"Iteration {i}: "
-                             f"Attached to Aware. p_id={p_id}, s_id={s_id}")
-                time.sleep(self.WAIT_FOR_CLUSTER) # Wait for devices to be ready
+                if not reuse_attach:
+                    ((p_id, p_mac), (s_id, s_mac)) = self._concurrent_exec(
+                        self.attach_with_identity, ((p_dut,), (s_dut,)))
+                    logging.info(
+                        "Iteration %d: Attached to Aware. p_id=%s, s_id=%s",
+                        i, p_id, s_id)
+                    # Wait for devices to be ready
+                    time.sleep(self.WAIT_FOR_CLUSTER)
                 # Initiator (p_dut) sets up server socket
-                p_dut_accept_handler = (
-                    p_dut.wifi_aware_snippet.connectivityServerSocketAccept()
-                )
+                p_dut_accept_handler = server_socket_accept()
                 network_id = p_dut_accept_handler.callback_id
-                logging.info(f"Iteration {i}: network_id={network_id}")
-
-                # Responder (s_dut) requests network
-                s_req_key = self.request_oob_network(
-                    s_dut, s_id, _DATA_PATH_RESPONDER,
-                    p_mac, None, None, network_id
-                )
-                # Initiator (p_dut) requests network
-                p_req_key = self.request_oob_network(
-                    p_dut, p_id, _DATA_PATH_INITIATOR,
-                    s_mac, None, None, network_id
-                )
+                logging.info("Iteration %d: network_id=%s", i, network_id)
+
+                # Responder (s_dut) and initiator (p_dut) request network
+                s_req_key, p_req_key = self._concurrent_exec(
+                    self.request_oob_network,
+                    ((s_dut, s_id, _DATA_PATH_RESPONDER,
+                      p_mac, None, None, network_id),
+                     (p_dut, p_id, _DATA_PATH_INITIATOR,
+                      s_mac, None, None, network_id)))
                 got_on_available = False
                 got_on_link_props = False
                 # Timeout for this iteration's network events
-                end_time = time.time() + _DEFAULT_TIMEOUT * 2
-
-                while time.time() < end_time and not (
-                        got_on_available and got_on_link_props):
-                    try:
-                        network_callback_event = s_req_key.waitAndGet(
-                            event_name=(
-                                constants.NetworkCbEventName.NETWORK_CALLBACK),
-                            timeout=5, # Short timeout for each event poll
-                        )
-                        logging.info(
-                            f"Iteration {i}: network_callback_event {
-                            network_callback_event.data}")
-                        event_name = network_callback_event.data[
-                            constants.NetworkCbEventKey.CALLBACK_NAME]
-                        if event_name == _ON_AVAILABLE:
-                            got_on_available = True
-                            on_available_latencies.append(
-                                network_callback_event.data[
-                                    _NETWORK_CB_KEY_CURRENT_TS]
-                                - network_callback_event.data[
-                                    _NETWORK_CB_KEY_CREATE_TS]
-                            )
-                        elif event_name == _NETWORK_CB_LINK_PROPERTIES_CHANGED:
-                            got_on_link_props = True
-                            link_props_latencies.append(
-                                network_callback_event.data[
-                                    _NETWORK_CB_KEY_CURRENT_TS]
-                                - network_callback_event.data[
-                                    _NETWORK_CB_KEY_CREATE_TS]
-                            )
-                    except queue.Empty:
-                        continue # Keep polling
+                deadline = time.monotonic() + _DEFAULT_TIMEOUT * 2
+
+                while not (got_on_available and got_on_link_props):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    # Block until the next callback or the iteration deadline,
+                    # whichever comes first.
+                    network_callback_event = _wait_for_event(
+                        s_req_key,
+                        _NETWORK_CALLBACK,
+                        remaining)
+                    if network_callback_event is None:
+                        break
+                    logging.info(
+                        "Iteration %d: network_callback_event %s", i,
+                        network_callback_event.data)
+                    event_data = network_callback_event.data
+                    event_name = event_data[_NETWORK_CB_KEY_CALLBACK_NAME]
+                    latency = (event_data[_NETWORK_CB_KEY_CURRENT_TS]
+                               - event_data[_NETWORK_CB_KEY_CREATE_TS])
+                    if event_name == _ON_AVAILABLE and not got_on_available:
+                        got_on_available = True
+                        on_available_latencies[num_on_available] = latency
+                        num_on_available += 1
+                        on_available_stats.add(latency)
+                    elif (event_name == _NETWORK_CB_LINK_PROPERTIES_CHANGED
+                          and not got_on_link_props):
+                        got_on_link_props = True
+                        link_props_latencies[num_link_props] = latency
+                        num_link_props += 1
                 if not got_on_available or not got_on_link_props:
                     raise Exception(
                         f"Did not get all required network callbacks. "
                         f"onAvailable={got_on_available}, "
                         f"onLinkProps={got_on_link_props}")
+                consecutive_failures = 0
 
             except Exception as e:
-                logging.error(f"Iteration {i}:"
-                              f" Failed NDP setup: {e}", exc_info=True)
+                logging.error("Iteration %d: Failed NDP setup: %s", i, e,
+                              exc_info=True)
                 ndp_setup_failures += 1
+                consecutive_failures += 1
             finally:
                 # CLEANUP for this iteration
-                if network_id:
-                    try:
-                        s_dut.wifi_aware_snippet.connectivityUnregisterNetwork(
-                            network_id)
-                    except Exception as e:
-                        logging.warning(
-                            f"Iteration {i}:"
-                            f" Error unregistering network on s_dut: {e}")
-                    try:
-                        p_dut.wifi_aware_snippet.connectivityUnregisterNetwork(
-                            network_id)
-                    except Exception as e:
-                        logging.warning(f"Iteration {i}: "
-                                        f"Error unregistering network on "
-                                        f"p_dut: {e}")
-                if s_id:
-                    try:
-                        s_dut.wifi_aware_snippet.wifiAwareDetach(s_id)
-                    except Exception as e:
-                        logging.warning(f"Iteration {i}: "
-                                        f"Error detaching Aware on s_dut: {e}")
-                if p_id:
-                    try:
-                        p_dut.wifi_aware_snippet.wifiAwareDetach(p_id)
-                    except Exception as e:
-                        logging.warning(f"Iteration {i}: "
-                                        f"Error detaching Aware on p_dut: {e}")
-                logging.info(f"Iteration {i}: Cleanup complete.")
+                self._concurrent_exec(
+                    self._cleanup_ndp_iteration,
+                    ((s_dut, network_id, None if reuse_attach else s_id, i),
+                     (p_dut, network_id, None if reuse_attach else p_id, i)))
+                logging.info("Iteration %d: Cleanup complete.", i)
+            if consecutive_failures == max_consecutive_failures:
+                logging.error(
+                    "Aborting after %d consecutive NDP setup failures",
+                    consecutive_failures)
+                results[key_avail]["aborted_after"] = iterations
+                break
+            if self._converged(
+                    on_available_stats, min_iters, target_relative_ci):
+                break
+        if reuse_attach:
+            self._concurrent_exec(
+                lambda ad, session_id: ad.wifi_aware_snippet.wifiAwareDetach(
+                    session_id),
+                ((p_dut, p_id), (s_dut, s_id)))
 
         # ... (rest of the stats extraction and reporting) ...
-        filename = f"{csv_name}.csv"
-        output_file = os.path.join(self.log_path, filename)
-
+        # Both summary rows go to the same CSV file, written in one go.
+        csv_rows = []
         autils.extract_stats(
             p_dut,
-            data=on_available_latencies,
+            data=on_available_latencies[:num_on_available],
             results=results[key_avail],
             key_prefix="",
             log_prefix="NDP setup OnAvailable(dw24=%d, dw5=%d)" % (dw_24ghz,
                                                                    dw_5ghz),
-            csv_filepath= output_file
+            io_executor=self._io_executor,
+            csv_rows=csv_rows,
+            cdf_filepath=self._cdf_path(key_avail),
+            samples_filepath=self._samples_path(key_avail)
         )
         autils.extract_stats(
             p_dut,
-            data=link_props_latencies,
+            data=link_props_latencies[:num_link_props],
             results=results[key_link_props],
             key_prefix="",
             log_prefix="NDP setup OnLinkProperties (dw24=%d, dw5=%d)" %
                        (dw_24ghz, dw_5ghz),
-            csv_filepath=output_file
+            io_executor=self._io_executor,
+            csv_rows=csv_rows,
+            cdf_filepath=self._cdf_path(key_link_props),
+            samples_filepath=self._samples_path(key_link_props)
         )
+        if csv_rows:
+            self._io_executor.submit(
+                autils.write_rows_to_csv, self._csv_path(csv_name),
+                autils.STATS_CSV_HEADER, csv_rows)
         results[key_avail]["ndp_setup_failures"] = ndp_setup_failures
+        results[key_avail]["iterations_run"] = iterations
 
     def find_callback_name(self, events, name):
         """Finds the first event in a list by its callback name.
 
         Args:
-            events: A list of event objects to search.
+            events: A list of event objects to search, or an index of them
+                    built by _index_by_callback_name.
             name: The callback name to find.
 
         Returns:
@@ -703,56 +1282,220 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
         Raises:
             ValueError: If no event with the specified name is found.
         """
-        for event in events:
-            if event.data[_CALLBACK_NAME] == name:
-                return event
-        # If the loop completes without finding a match, raise an error.
-        raise ValueError(f"Callback with name '{name}' not found.")
+        if not isinstance(events, dict):
+            events = _index_by_callback_name(events)
+        try:
+            return events[name]
+        except KeyError:
+            raise ValueError(f"Callback with name '{name}' not found.") from None
 
     def network_callback_events(self,
+                               ad,
                                key,
                                name,
                                timeout = 5,
-                                times = 3):
+                                times = 3,
+                               until_callback = None):
         """
         Attempts to collect up to 3 events from a queue.
 
-        This function will loop a maximum of three times, trying to fetch an
-        event in each iteration. The loop will exit early if the queue is
-        empty or if an unexpected error occurs.
+        The events are drained on the snippet side with wifiAwareDrainEvents,
+        which waits for the first event and returns every queued event up to
+        `times` in a single RPC. The loop will exit early if no event arrives
+        within the timeout, once an `until_callback` event was collected, or
+        if an unexpected error occurs.
 
         Args:
-            key: The object with the waitAndGet method.
+            ad: The device the callback handler belongs to.
+            key: The callback handler of the network request.
             name: The name of the event to wait for.
             timeout: The timeout in seconds for each wait attempt.
             times:Loop a maximum of times
+            until_callback: Optional callback name to stop collecting at. If
+                set, only this callback and onUnavailable are collected.
         Returns:
             A list of the events that were successfully collected.
         """
         all_available_events = []
-        # Loop a maximum of 3 times.
-        # The underscore '_' is used as the variable name because we don't
-        # need to use the loop counter itself.
-        for _ in range(times):
+        # Only the awaited callback and a request failure are of interest,
+        # so the others are dropped on the device.
+        callback_names = (None if until_callback is None
+                          else [until_callback, _NETWORK_CB_UNAVAILABLE])
+        while len(all_available_events) < times:
             try:
-                event = key.waitAndGet(
-                    event_name = name,
-                    timeout = timeout
-                )
-                all_available_events.append(event)
-                logging.info(f"Collected event: {event}")
-            except queue.Empty:
-                # The queue is empty, so we can't get any more events.
-                # Stop trying.
+                batch = self._collect_network_callback_batch(
+                    ad, key, name, timeout,
+                    times - len(all_available_events), callback_names)
+            except Exception as e:
+                # An unexpected error occurred. Log it and stop trying.
+                logging.error("An unexpected error occurred: %s", e)
+                break
+            if not batch:
                 logging.info(
                     "No more events in the queue. Exiting collection loop.")
                 break
-            except Exception as e:
-                # An unexpected error occurred. Log it and stop trying.
-                logging.error(f"An unexpected error occurred: {e}")
+            all_available_events.extend(batch)
+            logging.info("Collected events: %s", all_available_events)
+            if _has_callback(batch, until_callback):
                 break
         return all_available_events
 
+    def _collect_network_callback_batch(self, ad, key, name, timeout,
+                                        max_count, callback_names=None):
+        """Waits for network callback events and returns the queued ones.
+
+        If callback_names is set, the snippet only returns events with one of
+        these callback names; the fallback path returns all events.
+
+        Returns:
+            Up to max_count events, or an empty list if none arrived within
+            the timeout.
+        """
+        try:
+            batch = ad.wifi_aware_snippet.wifiAwareDrainEvents(
+                key.callback_id, name, int(timeout * 1000), max_count,
+                callback_names)
+        except errors.ApiError:
+            # The installed snippet does not provide the drain RPC, fall
+            # back to waiting for the first event and fetching the rest.
+            event = _wait_for_event(key, name, timeout)
+            if event is None:
+                return []
+            return [event, *key.getAll(name)]
+        return [callback_event.from_dict(event) for event in batch]
+
+    def _run_single_e2e_iteration(
+            self, p_dut, s_dut, p_id, s_id, network_id,
+            p_disc_args, s_disc_args):
+        """Runs one end-to-end latency iteration: attach, discovery and NDP.
+
+        Args:
+            p_dut: Publisher device.
+            s_dut: Subscriber device.
+            p_id: Publisher attach session id, or None to attach (and detach)
+                within the iteration.
+            s_id: Subscriber attach session id, or None to attach (and detach)
+                within the iteration.
+            network_id: The callback id of the publisher server socket.
+            p_disc_args: Publish arguments following the attach id.
+            s_disc_args: Subscribe arguments following the attach id.
+
+        Returns:
+            The latency in nanoseconds, or None if the service was not
+            discovered.
+        """
+        include_setup = p_id is None
+        timestamp_start_ns = time.perf_counter_ns()
+        if include_setup:
+            ((p_id, p_mac), (s_id, s_mac)) = self._concurrent_exec(
+                self.attach_with_identity, ((p_dut,), (s_dut,)))
+        # start publish and subscribe
+        ((p_disc_id, p_disc_event),
+         (s_disc_id, s_session_event)) = self._concurrent_exec(
+            self.start_discovery_session,
+            ((p_dut, p_id, *p_disc_args),
+             (s_dut, s_id, *s_disc_args)))
+        try:
+            # The publisher network request does not depend on the discovery,
+            # so it is issued while the subscriber waits for the service.
+            p_req_future = self._device_executor.submit(
+                self._request_network,
+                ad=p_dut,
+                discovery_session=p_disc_id.callback_id,
+                peer=None,
+                net_work_request_id=network_id,
+                is_accept_any_peer=True
+                )
+            discovered_event = _wait_for_event(
+                s_disc_id, _SERVICE_DISCOVERED, None)
+            p_req_key = p_req_future.result()
+            if discovered_event is None:
+                s_dut.log.info("[Subscriber] Timed out while waiting for "
+                               "SESSION_CB_ON_SERVICE_DISCOVERED")
+                return None
+            s_dut.log.info(
+                "[Subscriber] SESSION_CB_ON_SERVICE_DISCOVERED: %s",
+                discovered_event.data)
+            s_req_key = self._request_network(
+                s_dut,
+                s_disc_id.callback_id,
+                discovered_event.data[_PEER_ID],
+                network_id,
+                is_accept_any_peer=False
+                )
+            # Publisher & Subscriber: wait for network formation
+            # The data interfaces only keep their addresses while attached.
+            self._concurrent_exec(
+                self._wait_for_link_local_ipv6,
+                ((p_dut, p_req_key, not include_setup),
+                 (s_dut, s_req_key, not include_setup)))
+            return time.perf_counter_ns() - timestamp_start_ns
+        finally:
+            # Wait for the teardown rather than overlapping it with the next
+            # iteration: a publish session still alive when the next
+            # subscribe starts could be discovered instead of the new one.
+            self._concurrent_exec(
+                self._close_session_and_detach,
+                ((p_dut, p_disc_id.callback_id,
+                  p_id if include_setup else None),
+                 (s_dut, s_disc_id.callback_id,
+                  s_id if include_setup else None)))
+
+    def _warmup(self) -> None:
+        """Runs one unrecorded end-to-end cycle (attach, discovery, NDP)."""
+        logging.info("Running a warm-up end-to-end cycle")
+        network_id = (self.publisher.wifi_aware_snippet
+                      .connectivityServerSocketAccept().callback_id)
+        latency_ns = _safe_call(
+            "running the warm-up cycle", self._run_single_e2e_iteration,
+            self.publisher, self.subscriber, None, None, network_id,
+            (True, _PUBLISH_TYPE_UNSOLICITED, None),
+            (False, _SUBSCRIBE_TYPE_PASSIVE, None))
+        logging.info("Warm-up cycle latency: %s ns", latency_ns)
+        # The first test must not inherit the warm-up server socket and
+        # network requests.
+        _safe_call(
+            "releasing the warm-up server socket",
+            self.publisher.wifi_aware_snippet.connectivityReleaseAllSockets)
+        self._concurrent_exec(
+            lambda ad: _safe_call(
+                "unregistering the warm-up network",
+                ad.wifi_aware_snippet.connectivityUnregisterNetwork,
+                network_id),
+            ((self.publisher,), (self.subscriber,)))
+
+    def _wait_for_link_local_ipv6(self, ad, req_key, use_cache=False):
+        """Waits for the Aware network and returns its link local IPv6 address.
+
+        Args:
+            ad: The device that requested the network.
+            req_key: The callback handler of the network request.
+            use_cache: True to reuse the address last looked up for the same
+                interface instead of querying the device again.
+
+        Returns:
+            The link local IPv6 address of the Aware interface.
+        """
+        callback_events = self.network_callback_events(
+            ad,
+            req_key,
+            _NETWORK_CALLBACK,
+            timeout=_DEFAULT_TIMEOUT,
+            until_callback=_NETWORK_CB_LINK_PROPERTIES_CHANGED
+        )
+        callback_name = self.find_callback_name(
+            _index_by_callback_name(callback_events),
+            _NETWORK_CB_LINK_PROPERTIES_CHANGED)
+        aware_if = callback_name.data[_NETWORK_CB_KEY_INTERFACE_NAME]
+        cache_key = (ad.serial, aware_if)
+        ipv6 = self._ipv6_cache.get(cache_key) if use_cache else None
+        if ipv6 is None:
+            ipv6 = ad.wifi_aware_snippet.connectivityGetLinkLocalIpv6Address(
+                aware_if)
+            self._ipv6_cache[cache_key] = ipv6
+        ad.log.info('interfaceName = %s, ipv6=%s', aware_if, ipv6)
+        return ipv6
+
     def _request_network(
             self,
             ad: android_device.AndroidDevice,
@@ -773,10 +1516,10 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
                 else None,
             )
         )
-        network_request_dict = constants.NetworkRequest(
-            transport_type=_TRANSPORT_TYPE_WIFI_AWARE,
-            network_specifier_parcel=network_specifier_parcel,
-        ).to_dict()
+        network_request_dict = _NETWORK_REQUEST_TEMPLATE.copy()
+        if network_specifier_parcel:
+            network_request_dict['network_specifier_parcel'] = (
+                network_specifier_parcel)
         ad.log.debug(
             'Requesting Wi-Fi Aware network: %s', network_request_dict)
         return ad.wifi_aware_snippet.connectivityRequestNetwork(
@@ -787,7 +1530,9 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     def run_end_to_end_latency(
             self, results, dw_24ghz, dw_5ghz,
             num_iterations, include_setup,
-            instant_mode = None, csv_name="latency_test"):
+            instant_mode = None, csv_name="latency_test",
+            min_iters=5, target_relative_ci=None,
+            max_consecutive_failures=None):
         """Measure the latency for end-to-end communication link setup:
         - Start Aware
         - Discovery
@@ -803,133 +1548,102 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
                         measurements.
             instant_mode: set the band to use instant communication mode, 2G or 5G
             csv_name: csv file test result name.
+            min_iters: Minimum number of samples before stopping early.
+            target_relative_ci: If set, stop before num_iterations once the
+                relative 95% CI of the latency is below this value.
+            max_consecutive_failures: If set, stop after this many consecutive
+                failed iterations and record the iteration count as
+                "aborted_after".
         """
 
         key = "dw24_%d_dw5_%d" % (dw_24ghz, dw_5ghz)
-        results[key] = {}
-        results[key]["num_iterations"] = num_iterations
+        results[key] = {"num_iterations": num_iterations}
         p_dut = self.ads[0]
         p_dut.pretty_name = "Publisher"
         s_dut = self.ads[1]
         s_dut.pretty_name ="Subscriber"
         # override the default DW configuration
-        autils.config_power_settings(p_dut, dw_24ghz, dw_5ghz)
-        autils.config_power_settings(s_dut, dw_24ghz, dw_5ghz)
-        latencies = []
+        self._config_power_settings((p_dut, s_dut), dw_24ghz, dw_5ghz)
+        # Integer nanoseconds, filled in order of successful iterations.
+        latencies_ns = [0] * num_iterations
+        latency_stats = autils.RunningStats()
+        iterations = 0
 
         # allow for failures here since running lots of samples and would like to
         # get the partial data even in the presence of errors
         failures = 0
-
-        if not include_setup:
+        consecutive_failures = 0
+
+        if include_setup:
+            # Attach inside every iteration so the setup is measured.
+            p_id, s_id = None, None
+        elif (self._e2e_reuse_attach
+              and p_dut.serial in self._kept_attach_ids
+              and s_dut.serial in self._kept_attach_ids):
+            # Attached by an earlier post-attach test.
+            p_id = self._kept_attach_ids[p_dut.serial]
+            s_id = self._kept_attach_ids[s_dut.serial]
+        else:
             # Publisher+Subscriber: attach and wait for confirmation
-            p_id, p_mac = self.attach_with_identity(p_dut)
-            s_id, s_mac = self.attach_with_identity(s_dut)
+            ((p_id, p_mac), (s_id, s_mac)) = self._concurrent_exec(
+                self.attach_with_identity, ((p_dut,), (s_dut,)))
+            if self._e2e_reuse_attach:
+                self._kept_attach_ids[p_dut.serial] = p_id
+                self._kept_attach_ids[s_dut.serial] = s_id
         p_dut_accept_handler = (
             p_dut.wifi_aware_snippet.connectivityServerSocketAccept()
         )
         network_id = p_dut_accept_handler.callback_id
-        for i in range(num_iterations):
-            while (True):
-                # for pseudo-goto/finalize
-                timestamp_start = time.perf_counter()
-                if include_setup:
-                    p_id, p_mac = self.attach_with_identity(p_dut)
-                    s_id, s_mac = self.attach_with_identity(s_dut)
-                # start publish
-                p_disc_id, p_disc_event = self.start_discovery_session(
-                    p_dut, p_id, True, _PUBLISH_TYPE_UNSOLICITED, instant_mode)
-                # start subscribe
-                s_disc_id, s_session_event = self.start_discovery_session(
-                    s_dut, s_id, False, _SUBSCRIBE_TYPE_PASSIVE, instant_mode)
-
-                p_req_key = self._request_network(
-                    ad=p_dut,
-                    discovery_session=p_disc_id.callback_id,
-                    peer=None,
-                    net_work_request_id=network_id,
-                    is_accept_any_peer=True
-                    )
-                try:
-                    discovered_event = s_disc_id.waitAndGet(
-                        _SERVICE_DISCOVERED)
-                    s_dut.log.info(
-                        "[Subscriber] SESSION_CB_ON_SERVICE_DISCOVERED: %s",
-                            discovered_event.data)
-                    peer_id_on_sub = discovered_event.data[
-                        constants.WifiAwareSnippetParams.PEER_ID]
-                except queue.Empty:
-                    s_dut.log.info("[Subscriber] Timed out while waiting for "
-                                    "SESSION_CB_ON_SERVICE_DISCOVERED")
+        # Loop invariant discovery arguments, completed with the attach id.
+        p_disc_args = (True, _PUBLISH_TYPE_UNSOLICITED, instant_mode)
+        s_disc_args = (False, _SUBSCRIBE_TYPE_PASSIVE, instant_mode)
+        try:
+            for i in range(num_iterations):
+                iterations += 1
+                latency_ns = self._run_single_e2e_iteration(
+                    p_dut, s_dut, p_id, s_id, network_id,
+                    p_disc_args, s_disc_args)
+                if latency_ns is None:
                     failures = failures + 1
+                    consecutive_failures += 1
+                    if consecutive_failures == max_consecutive_failures:
+                        logging.error(
+                            "Aborting after %d consecutive failed iterations",
+                            consecutive_failures)
+                        results[key]["aborted_after"] = iterations
+                        break
+                    continue
+                consecutive_failures = 0
+                latencies_ns[i - failures] = latency_ns
+                latency_stats.add(latency_ns)
+                if self._converged(
+                        latency_stats, min_iters, target_relative_ci):
                     break
-                s_req_key = self._request_network(
-                    s_dut,
-                    s_disc_id.callback_id,
-                    peer_id_on_sub,
-                    network_id,
-                    is_accept_any_peer=False
-                    )
-                    # Publisher & Subscriber: wait for network formation
-                p_callback_event = self.network_callback_events(
-                    p_req_key,
-                    constants.NetworkCbEventName.NETWORK_CALLBACK,
-                    timeout=_DEFAULT_TIMEOUT
-                )
-                p_callback_name=(
-                    self.find_callback_name(
-                        p_callback_event,
-                        constants.NetworkCbName.ON_PROPERTIES_CHANGED))
-                s_callback_event = self.network_callback_events(
-                    s_req_key,
-                    constants.NetworkCbEventName.NETWORK_CALLBACK,
-                    timeout=_DEFAULT_TIMEOUT
-                )
-                s_callback_name=(
-                    self.find_callback_name(
-                        s_callback_event,
-                        constants.NetworkCbName.ON_PROPERTIES_CHANGED))
-                p_aware_if= p_callback_name.data[
-                        constants.NetworkCbEventKey.NETWORK_INTERFACE_NAME
-                        ]
-                s_aware_if = s_callback_name.data[
-                    constants.NetworkCbEventKey.NETWORK_INTERFACE_NAME
-                    ]
-                p_ipv6 = (
-                    p_dut.wifi_aware_snippet.connectivityGetLinkLocalIpv6Address(
-                        p_aware_if
-                    )
-                )
-                p_dut.log.info(
-                    'interfaceName = %s, ipv6=%s', p_aware_if, p_ipv6)
-                s_ipv6 = (
-                    s_dut.wifi_aware_snippet.connectivityGetLinkLocalIpv6Address(
-                        s_aware_if
-                    )
-                )
-                s_dut.log.info(
-                    'interfaceName = %s, ipv6=%s', s_aware_if, s_ipv6)
-                latencies.append(time.perf_counter() - timestamp_start)
-                break
-            p_dut.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-                p_disc_id.callback_id)
-            s_dut.wifi_aware_snippet.wifiAwareCloseDiscoverSession(
-                s_disc_id.callback_id)
-            if include_setup:
-                p_dut.wifi_aware_snippet.wifiAwareDetach(p_id)
-                s_dut.wifi_aware_snippet.wifiAwareDetach(s_id)
-
-        filename = f"{csv_name}.csv"
-        output_file = os.path.join(self.log_path, filename)
+        finally:
+            # Detach the sessions attached for this run only; the
+            # include_setup iterations detach themselves and kept sessions
+            # are reused by the next post-attach test.
+            if not include_setup and not self._e2e_reuse_attach:
+                self._concurrent_exec(
+                    lambda ad, session_id: _safe_call(
+                        "detaching", ad.wifi_aware_snippet.wifiAwareDetach,
+                        session_id),
+                    ((p_dut, p_id), (s_dut, s_id)))
+        results[key]["iterations_run"] = iterations
+        latencies = [
+            ns / 1e9 for ns in latencies_ns[:iterations - failures]]
+
+        output_file = self._csv_path(csv_name)
         autils.extract_stats(
             s_dut,
             data=latencies,
             results=results[key],
             key_prefix="",
             log_prefix=f"E2E Latency (dw24={dw_24ghz}, dw5={dw_5ghz})",
-            csv_filepath=output_file)
-        asserts.explicit_pass(
-            "test_end_to_end_latency_default_dws finished", extras=results)
+            csv_filepath=output_file,
+            io_executor=self._io_executor,
+            cdf_filepath=self._cdf_path(key),
+            samples_filepath=self._samples_path(key))
 
 
     ####################################################
@@ -947,24 +1661,7 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     # timeout_period: Time period over which to measure synchronization
     ####################################################
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    @ApiTest(apis=_AWARE_DISCOVERY_APIS)
 
     def test_synchronization_default_dws(self):
         """Measure the device synchronization for default dws. Loop over values
@@ -983,24 +1680,7 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             "test_synchronization_default_dws finished", extras=results)
         autils.save_results_to_json(results, "synchronization_default_dws.json" )
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    @ApiTest(apis=_AWARE_DISCOVERY_APIS)
 
     def test_synchronization_non_interactive_dws(self):
         """Measure the device synchronization for non-interactive dws. Loop over
@@ -1037,24 +1717,7 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     # csv_name: csv file test result name.
     ####################################################
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    @ApiTest(apis=_AWARE_DISCOVERY_APIS)
 
     def test_discovery_latency_default_dws(self):
         """Measure the service discovery latency with the default DW configuration.
@@ -1066,29 +1729,13 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
             dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
             num_iterations=100,
-            csv_name="test_discovery_default_dws")
+            csv_name="test_discovery_default_dws",
+            reuse_attach=self._discovery_reuse_attach)
         asserts.explicit_pass(
             "test_discovery_latency_default_parameters finished",
             extras=results)
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    @ApiTest(apis=_AWARE_DISCOVERY_APIS)
 
     def test_discovery_latency_non_interactive_dws(self):
         """Measure the service discovery latency with the DW configuration for non
@@ -1100,43 +1747,61 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
             dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_NON_INTERACTIVE,
             dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_NON_INTERACTIVE,
             num_iterations=100,
-            csv_name="test_discovery_interactive_dws")
+            csv_name="test_discovery_interactive_dws",
+            reuse_attach=self._discovery_reuse_attach)
         asserts.explicit_pass(
             "test_discovery_latency_non_interactive_dws finished",
             extras=results)
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    @ApiTest(apis=_AWARE_DISCOVERY_APIS)
 
     def test_discovery_latency_all_dws(self):
         """Measure the service discovery latency with all DW combinations (low
-    iteration count)"""
-        results = {}
-        for dw24 in range(1, 6):  # permitted values: 1-5
-            for dw5 in range(0, 6):  # permitted values: 0, 1-5
+    iteration count). When more than two devices are registered, the
+    combinations are spread over the available publisher/subscriber pairs."""
+        # Rows of all DW combinations, written to the CSV file in one go.
+        csv_rows = []
+        free_pairs = queue.Queue()
+        for i in range(len(self.ads) // 2):
+            free_pairs.put((self.ads[2 * i], self.ads[2 * i + 1]))
+
+        def run_on_free_pair(dw24, dw5):
+            p_dut, s_dut = free_pairs.get()
+            try:
+                pair_results = {}
                 self.run_discovery_latency(
-                    results=results,
+                    results=pair_results,
                     do_unsolicited_passive=True,
                     dw_24ghz=dw24,
                     dw_5ghz=dw5,
                     num_iterations=10,
-                    csv_name="test_discovery_latency_all_dws")
+                    p_dut=p_dut,
+                    s_dut=s_dut,
+                    strict_timeout=not self._discovery_adaptive_timeout,
+                    reuse_attach=self._discovery_reuse_attach,
+                    csv_rows=csv_rows,
+                    # The pairs publish at the same time; a shared name
+                    # would let one pair discover another's publisher.
+                    service_name=f"{_DISCOVERY_SERVICE_NAME}_{dw24}_{dw5}")
+                return pair_results
+            finally:
+                free_pairs.put((p_dut, s_dut))
+
+        results = {}
+        # A separate short-lived pool: the pair workers fan out to the
+        # device executor, and sharing it could exhaust its workers.
+        for pair_results in utils.concurrent_exec(
+                run_on_free_pair,
+                [(dw24, dw5)
+                 for dw24 in range(1, 6)  # permitted values: 1-5
+                 for dw5 in range(0, 6)],  # permitted values: 0, 1-5
+                max_workers=free_pairs.qsize(),
+                raise_on_exception=True):
+            results.update(pair_results)
+        self._io_executor.submit(
+            autils.write_rows_to_csv,
+            self._csv_path("test_discovery_latency_all_dws"),
+            autils.STATS_CSV_HEADER, csv_rows)
         asserts.explicit_pass(
             "test_discovery_latency_all_dws finished", extras=results)
 
@@ -1156,149 +1821,8 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     # csv_name: csv file test result name.
     ####################################################
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-            'android.net.wifi.aware.DiscoverySession#sendMessage(int, byte[])',
-        ]
-    )
-
-    def test_message_latency_default_dws(self):
-        """Measure the send message latency with the default DW configuration. Test
-    performed on non-queued message transmission - i.e. waiting for confirmation
-    of reception (ACK) before sending the next message."""
-        results = {}
-        self.run_message_latency(
-            results=results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=100,
-            csv_name= "test_message_latency_default"
-        )
-        asserts.explicit_pass(
-            "test_message_latency_default_dws finished", extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-            'android.net.wifi.aware.DiscoverySession#sendMessage(int, byte[])',
-        ]
-    )
-
-    def test_message_latency_default_dws_instant_mode_2g(self):
-        """Measure the send message latency with the default DW configuration. Test
-    performed on non-queued message transmission - i.e. waiting for confirmation
-    of reception (ACK) before sending the next message."""
-        results = {}
-        self.run_message_latency(
-            results=results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=100,
-            instant_mode="2G",
-            csv_name= "test_message_latency_default_dws_instant_mode_2g"
-        )
-        asserts.explicit_pass(
-            "test_message_latency_default_dws finished", extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-            'android.net.wifi.aware.DiscoverySession#sendMessage(int, byte[])',
-        ]
-    )
-
-    def test_message_latency_default_dws_instant_mode_5g(self):
-        """Measure the send message latency with the default DW configuration. Test
-    performed on non-queued message transmission - i.e. waiting for confirmation
-    of reception (ACK) before sending the next message."""
-        results = {}
-        self.run_message_latency(
-            results=results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=100,
-            instant_mode="5G",
-            csv_name= "test_message_latency_default_dws_instant_mode_5g"
-        )
-        asserts.explicit_pass(
-            "test_message_latency_default_dws finished", extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.net.wifi.aware.DiscoverySessionCallback,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-            'android.net.wifi.aware.DiscoverySession#sendMessage(int, byte[])',
-        ]
-    )
-
-    def test_message_latency_non_interactive_dws(self):
-        """Measure the send message latency with the DW configuration for
-    non-interactive mode. Test performed on non-queued message transmission -
-    i.e. waiting for confirmation of reception (ACK) before sending the next
-    message."""
-        results = {}
-        self.run_message_latency(
-            results=results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_NON_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_NON_INTERACTIVE,
-            num_iterations=100,
-            csv_name= "test_message_latency_non_interactive_dws"
-        )
-        asserts.explicit_pass(
-            "test_message_latency_non_interactive_dws finished",
-            extras=results)
+    # The test_message_latency_* methods are generated from
+    # _MESSAGE_LATENCY_CASES below the class.
 
     # ###################################################
     #  Wi-Fi Aware NDP setup with OOB (out-of-band) discovery latency test:
@@ -1316,69 +1840,8 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     #
     # ###################################################
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
-
-    def test_oob_ndp_setup_latency_default_dws(self):
-        """Measure the NDP setup latency with the default DW configuration. The
-    NDP is setup with OOB (out-of-band) configuration."""
-        results = {}
-        self.run_ndp_oob_latency(
-            results=results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=100,
-            csv_name= "test_oob_ndp_latency_default"
-        )
-        asserts.explicit_pass(
-            "test_ndp_setup_latency_default_dws finished", extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
-
-    def test_oob_ndp_setup_latency_non_interactive_dws(self):
-        """Measure the NDP setup latency with the DW configuration for
-    non-interactive mode. The NDP is setup with OOB (out-of-band)
-    configuration"""
-        results = {}
-        self.run_ndp_oob_latency(
-            results=results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_NON_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_NON_INTERACTIVE,
-            num_iterations=100,
-            csv_name= "test_oob_ndp_latency_non_interactive"
-        )
-        asserts.explicit_pass(
-            "test_ndp_setup_latency_non_interactive_dws finished",
-            extras=results)
+    # The test_oob_ndp_setup_latency_* methods are generated from
+    # _OOB_NDP_LATENCY_CASES below the class.
 
     ####################################################
     #  Measure the latency for end-to-end communication link setup:
@@ -1403,242 +1866,95 @@ class WifiAwarelatencytest(base_test.BaseTestClass):
     #
     ####################################################
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    # The test_end_to_end_latency_* methods are generated from
+    # _E2E_LATENCY_CASES below the class.
 
-    def test_end_to_end_latency_default_dws(self):
-        """Measure the latency for end-to-end communication link setup:
-        - Start Aware
-        - Discovery
-        - NDP setup
-        """
-        results = {}
-        self.run_end_to_end_latency(
-            results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=10,
-            include_setup=True,
-            csv_name="test_end_to_end_latency_default_dws"
-        )
-        asserts.explicit_pass(
-            "test_ndp_setup_latency_non_interactive_dws finished",
-            extras=results)
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+def _message_latency_test(name, case):
+    """Returns a message latency test method running the given case."""
 
-    def test_end_to_end_latency_default_dws_instant_mode_2g(self):
-        """Measure the latency for end-to-end communication link setup:
-      - Start Aware
-      - Discovery
-      - NDP setup
-        """
+    @ApiTest(apis=_AWARE_MESSAGE_APIS)
+    def test(self):
         results = {}
-        self.run_end_to_end_latency(
-            results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=10,
-            include_setup=True,
-            instant_mode="2G",
-            csv_name="test_end_to_end_latency_default_dws_instant_mode_2g")
-        asserts.explicit_pass(
-            "test_end_to_end_latency_default_dws finished", extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+        self.run_message_latency(
+            results=results, num_iterations=100, **case)
+        asserts.explicit_pass(f"{name} finished", extras=results)
 
-    def test_end_to_end_latency_default_dws_instant_mode_5g(self):
-        """Measure the latency for end-to-end communication link setup:
-        - Start Aware
-        - Discovery
-        - NDP setup
-        """
-        results = {}
-        self.run_end_to_end_latency(
-            results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=10,
-            include_setup=True,
-            instant_mode="5G",
-            csv_name="test_end_to_end_latency_default_dws_instant_mode_5g")
-        asserts.explicit_pass(
-            "test_end_to_end_latency_default_dws finished", extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
+    test.__name__ = name
+    test.__doc__ = (
+        "Measure the send message latency. Test performed on non-queued "
+        "message transmission - i.e. waiting for confirmation of reception "
+        "(ACK) before sending the next message.")
+    return test
 
-    def test_end_to_end_latency_post_attach_default_dws(self):
-        """Measure the latency for end-to-end communication link setup without
-        the initial synchronization:
-        - Start Aware & synchronize initially
-        - Loop:
-        - Discovery
-        - NDP setup
-        """
-        results = {}
-        self.run_end_to_end_latency(
-            results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=10,
-            include_setup=False,
-            csv_name="test_end_to_end_latency_post_attach_default_dws")
-        asserts.explicit_pass(
-            "test_end_to_end_latency_post_attach_default_dws finished",
-            extras=results)
 
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
-
-    def test_end_to_end_latency_post_attach_default_dws_instant_mode_2g(self):
-        """Measure the latency for end-to-end communication link setup without
-        the initial synchronization:
-        - Start Aware & synchronize initially
-        - Loop:
-        - Discovery
-        - NDP setup
-        """
-        asserts.skip_if(not(
-            autils.get_aware_capabilities(self.publisher)["isInstantCommunicationModeSupported"]
-            and autils.get_aware_capabilities(self.subscriber)["isInstantCommunicationModeSupported"])
-            ,"Device doesn't support instant communication mode"
-        )
+def _oob_ndp_latency_test(name, case):
+    """Returns an OOB NDP setup latency test method running the given case."""
 
+    @ApiTest(apis=_AWARE_NDP_APIS)
+    def test(self):
         results = {}
-        self.run_end_to_end_latency(
-            results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=10,
-            include_setup=False,
-            instant_mode="2G",
-            csv_name="test_end_to_end_latency_post_attach_default_dws_instant_mode_2g")
-        asserts.explicit_pass(
-            "test_end_to_end_latency_post_attach_default_dws_instant_mode finished",
-            extras=results)
-
-    @ApiTest(
-        apis=[
-            'android.net.wifi.aware.WifiAwareManager#attach('
-            'android.net.wifi.aware.AttachCallback,'
-            'android.net.wifi.aware.IdentityChangedListener,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#publish('
-            'android.net.wifi.aware.PublishConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareSession#subscrible('
-            'android.net.wifi.aware.SubscribeConfig,'
-            'android.os.Handler)',
-            'android.net.wifi.aware.WifiAwareNetworkSpecifier.Builder#build',
-            'android.net.wifi.aware.WifiAwareSession#createNetworkSpecifierOpen(byte[])',
-        ]
-    )
-
-    def test_end_to_end_latency_post_attach_default_dws_instant_mode_5g(self):
-        """Measure the latency for end-to-end communication link setup without
-        the initial synchronization:
-        - Start Aware & synchronize initially
-        - Loop:
-        - Discovery
-        - NDP setup
-        """
-
-        asserts.skip_if(not(
-                autils.get_aware_capabilities(self.publisher)["isInstantCommunicationModeSupported"]
-                and autils.get_aware_capabilities(self.subscriber)["isInstantCommunicationModeSupported"])
-                        ,"Device doesn't support instant communication mode"
-        )
+        self.run_ndp_oob_latency(
+            results=results, num_iterations=100,
+            reuse_attach=self._ndp_reuse_attach,
+            min_iters=self._min_iterations,
+            target_relative_ci=self._target_relative_ci,
+            max_consecutive_failures=self._max_consecutive_failures, **case)
+        _explicit_pass_unless_aborted(name, results)
+
+    test.__name__ = name
+    test.__doc__ = (
+        "Measure the NDP setup latency. The NDP is setup with OOB "
+        "(out-of-band) configuration.")
+    return test
+
+
+def _e2e_latency_test(name, case):
+    """Returns an end-to-end latency test method running the given case."""
+
+    @ApiTest(apis=_AWARE_NDP_APIS)
+    def test(self):
+        if case.get("instant_mode") and not case["include_setup"]:
+            self._skip_unless_instant_mode_supported()
         results = {}
         self.run_end_to_end_latency(
-            results,
-            dw_24ghz=constants.AwarePowerSettings.POWER_DW_24_INTERACTIVE,
-            dw_5ghz=constants.AwarePowerSettings.POWER_DW_5_INTERACTIVE,
-            num_iterations=10,
-            include_setup=False,
-            instant_mode="5G",
-            csv_name="test_end_to_end_latency_post_attach_default_dws_instant_mode_5g")
-        asserts.explicit_pass(
-            "test_end_to_end_latency_post_attach_default_dws_instant_mode finished",
-            extras=results)
+            results, num_iterations=10, csv_name=name,
+            min_iters=self._min_iterations,
+            target_relative_ci=self._target_relative_ci,
+            max_consecutive_failures=self._max_consecutive_failures, **case)
+        _explicit_pass_unless_aborted(name, results)
+
+    test.__name__ = name
+    if case["include_setup"]:
+        test.__doc__ = (
+            "Measure the latency for end-to-end communication link setup: "
+            "Start Aware, Discovery, NDP setup.")
+    else:
+        test.__doc__ = (
+            "Measure the latency for end-to-end communication link setup "
+            "without the initial synchronization: Start Aware & synchronize "
+            "initially, then loop over Discovery and NDP setup.")
+    return test
+
+
+for _suffix, _case in _MESSAGE_LATENCY_CASES.items():
+    _name = f"test_message_latency_{_suffix}"
+    setattr(WifiAwarelatencytest, _name, _message_latency_test(_name, _case))
+for _suffix, _case in _OOB_NDP_LATENCY_CASES.items():
+    _name = f"test_oob_ndp_setup_latency_{_suffix}"
+    setattr(WifiAwarelatencytest, _name, _oob_ndp_latency_test(_name, _case))
+for _suffix, _case in _E2E_LATENCY_CASES.items():
+    _name = f"test_end_to_end_latency_{_suffix}"
+    setattr(WifiAwarelatencytest, _name, _e2e_latency_test(_name, _case))
 
 
 if __name__ == '__main__':
     # Take test args
-    if '--' in sys.argv:
+    try:
         index = sys.argv.index('--')
+    except ValueError:
+        pass
+    else:
         sys.argv = sys.argv[:1] + sys.argv[index + 1:]
 
     test_runner.main()
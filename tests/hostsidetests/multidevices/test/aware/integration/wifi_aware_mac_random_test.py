@@ -73,7 +73,7 @@ class MacRandomTest(base_test.BaseTestClass):
     utils.concurrent_exec(
         setup_device,
         param_list=[[ad] for ad in self.ads],
-        max_workers=1,
+        max_workers=len(self.ads),
         raise_on_exception=True,
     )
 
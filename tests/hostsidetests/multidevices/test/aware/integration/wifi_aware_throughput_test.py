@@ -14,6 +14,7 @@
 
 # Lint as: python3
 """Wi-Fi Aware Throughput test reimplemented in Mobly."""
+import concurrent.futures
 import logging
 import sys
 import time
@@ -31,6 +32,7 @@ from mobly import utils
 from mobly.controllers import android_device
 from mobly.controllers.android_device_lib import callback_handler_v2
 from mobly.snippet import callback_event
+from mobly.snippet import errors
 from queue import Empty
 
 
@@ -50,6 +52,11 @@ _NETWORK_CB_KEY_NETWORK_SPECIFIER = "network_specifier"
 _NETWORK_CB_LINK_PROPERTIES_CHANGED = (
     constants.NetworkCbName.ON_PROPERTIES_CHANGED)
 _NETWORK_CB_KEY_INTERFACE_NAME = "interfaceName"
+_NETWORK_CALLBACK = constants.NetworkCbEventName.NETWORK_CALLBACK
+_NETWORK_CB_CAPABILITIES_CHANGED = (
+    constants.NetworkCbName.ON_CAPABILITIES_CHANGED)
+_NETWORK_CB_KEY_IPV6 = constants.NetworkCbName.NET_CAP_IPV6
+_NETWORK_CB_KEY_CHANNEL_IN_MHZ = constants.NetworkCbEventKey.CHANNEL_IN_MHZ
 
 # Aware Data-Path Constants
 _DATA_PATH_INITIATOR = 0
@@ -63,6 +70,18 @@ _REQUEST_NETWORK_TIMEOUT_MS = 15 * 1000
 
 _NETWORK_CB_KEY_WIFI_AWARE_CHANNEL = "wifi_aware_channel"
 
+# ping6 summary lines.
+_PING_RTT_PATTERN = re.compile(r'rtt min/avg/max/mdev = ([\d./]+)')
+_PING_TIME_PATTERN = re.compile(r'time (\d+ms)\s+')
+
+
+def _index_by_callback_name(events):
+    """Maps each callback name to the first event with that name."""
+    index = {}
+    for event in events:
+        index.setdefault(event.data[_CALLBACK_NAME], event)
+    return index
+
 
 class WifiAwareThroughputTest(base_test.BaseTestClass):
     """Set of tests for Wi-Fi Aware data-path."""
@@ -80,19 +99,27 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
     ads: list[android_device.AndroidDevice]
     publisher: android_device.AndroidDevice
     subscriber: android_device.AndroidDevice
+    # Whether the installed snippet provides wifiAwareDrainEvents.
+    _drain_events_supported: bool
+    # Runs the iperf3 server start while the NDP is being set up.
+    _iperf_server_executor: concurrent.futures.ThreadPoolExecutor
 
     def setup_class(self):
         # Register two Android devices.
         self.ads = self.register_controller(android_device, min_number=2)
         self.publisher = self.ads[0]
         self.subscriber = self.ads[1]
+        self._drain_events_supported = True
+        self._iperf_server_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='iperf-server')
 
         def setup_device(device: android_device.AndroidDevice):
             device.load_snippet(
                 'wifi_aware_snippet', PACKAGE_NAME
             )
-            for permission in RUNTIME_PERMISSIONS:
-                device.adb.shell(['pm', 'grant', PACKAGE_NAME, permission])
+            device.adb.shell(' && '.join(
+                f'pm grant {PACKAGE_NAME} {permission}'
+                for permission in RUNTIME_PERMISSIONS))
             asserts.abort_all_if(
                 not device.wifi_aware_snippet.wifiAwareIsAvailable(),
                 f'{device} Wi-Fi Aware is not available.',
@@ -106,14 +133,17 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             raise_on_exception=True,
         )
 
+    def teardown_class(self):
+        self._iperf_server_executor.shutdown(wait=True)
+
     def setup_test(self):
         for ad in self.ads:
             autils.control_wifi(ad, True)
-            aware_avail = ad.wifi_aware_snippet.wifiAwareIsAvailable()
+            snippet = ad.wifi_aware_snippet
+            aware_avail = snippet.wifiAwareIsAvailable()
             if not aware_avail:
                 ad.log.info('Aware not available. Waiting ...')
-                state_handler = (
-                    ad.wifi_aware_snippet.wifiAwareMonitorStateChange())
+                state_handler = snippet.wifiAwareMonitorStateChange()
                 state_handler.waitAndGet(
                     constants.WifiAwareBroadcast.WIFI_AWARE_AVAILABLE)
 
@@ -133,8 +163,9 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
 
     def _teardown_test_on_device(
             self, ad: android_device.AndroidDevice) -> None:
-        ad.wifi_aware_snippet.wifiAwareCloseAllWifiAwareSession()
-        ad.wifi_aware_snippet.connectivityReleaseAllSockets()
+        snippet = ad.wifi_aware_snippet
+        snippet.wifiAwareCloseAllWifiAwareSession()
+        snippet.connectivityReleaseAllSockets()
         if ad.is_adb_root:
           autils.reset_device_parameters(ad)
           autils.validate_forbidden_callbacks(ad)
@@ -155,8 +186,9 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
         is_accept_any_peer: bool = False,
     ) -> callback_handler_v2.CallbackHandlerV2:
         """Requests and configures a Wi-Fi Aware network connection."""
+        snippet = ad.wifi_aware_snippet
         network_specifier_parcel = (
-            ad.wifi_aware_snippet.wifiAwareCreateNetworkSpecifier(
+            snippet.wifiAwareCreateNetworkSpecifier(
                 discovery_session,
                 peer,
                 is_accept_any_peer,
@@ -171,23 +203,27 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
         ).to_dict()
         ad.log.debug(
             'Requesting Wi-Fi Aware network: %s', network_request_dict)
-        return ad.wifi_aware_snippet.connectivityRequestNetwork(
+        return snippet.connectivityRequestNetwork(
             net_work_request_id,
             network_request_dict, _REQUEST_NETWORK_TIMEOUT_MS
         )
 
     def network_callback_event(self,
+                             ad,
                              key,
                              name,
                              timeout = 5):
         """
         Attempts to collect up to 3 events from a queue.
 
-        This function will loop a maximum of three times, trying to fetch an
-        event in each iteration. The loop will exit early if the queue is
-        empty or if an unexpected error occurs.
+        Each wifiAwareDrainEvents call waits for the next event and also
+        returns the ones already queued behind it, so usually a single RPC
+        collects all three. The collection stops early if no event arrives
+        within the timeout. Snippets without the drain RPC fall back to one
+        waitAndGet per event.
 
         Args:
+            ad: The device the events are posted on.
             key: The object with the waitAndGet method.
             name: The name of the event to wait for.
             timeout: The timeout in seconds for each wait attempt.
@@ -196,17 +232,38 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             A list of the events that were successfully collected.
         """
         all_available_events = []
-        # Loop a maximum of 3 times.
+        if self._drain_events_supported:
+            try:
+                while len(all_available_events) < 3:
+                    batch = ad.wifi_aware_snippet.wifiAwareDrainEvents(
+                        key.callback_id, name, int(timeout * 1000),
+                        3 - len(all_available_events))
+                    if not batch:
+                        logging.info(
+                            "No more events in the queue. Exiting collection "
+                            "loop.")
+                        break
+                    for event in batch:
+                        event = callback_event.from_dict(event)
+                        all_available_events.append(event)
+                        logging.info("Collected event: %s", event)
+                return all_available_events
+            except errors.ApiError:
+                # Only checked once per class; the fallback below collects
+                # the remaining events.
+                ad.log.info("wifiAwareDrainEvents is not available.")
+                self._drain_events_supported = False
+        # Loop until 3 events were collected.
         # The underscore '_' is used as the variable name because we don't
         # need to use the loop counter itself.
-        for _ in range(3):
+        for _ in range(3 - len(all_available_events)):
             try:
                 event = key.waitAndGet(
                 event_name = name,
                 timeout = timeout
                 )
                 all_available_events.append(event)
-                logging.info(f"Collected event: {event}")
+                logging.info("Collected event: %s", event)
             except Empty:
                 # The queue is empty, so we can't get any more events.
                 # Stop trying.
@@ -215,16 +272,50 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
                 break
             except Exception as e:
                 # An unexpected error occurred. Log it and stop trying.
-                logging.error(f"An unexpected error occurred: {e}")
+                logging.error("An unexpected error occurred: %s", e)
                 break
         return all_available_events
 
-    def find_callback_name(self, events, name):
-        for event in events:
-            if event.data[_CALLBACK_NAME] == name:
-                return event
-        # If the loop completes without finding a match, raise an error.
-        raise ValueError(f"Callback with name '{name}' not found.")
+    def _collect_network_callbacks(
+            self, init_dut, init_req_key, resp_dut, resp_req_key):
+        """Collects the network callbacks of both peers concurrently.
+
+        The network requests themselves are issued in order beforehand, so
+        that the responder is ready when the initiator starts the NDP.
+
+        Args:
+            init_dut: Initiator device.
+            init_req_key: Initiator network request callback handler.
+            resp_dut: Responder device.
+            resp_req_key: Responder network request callback handler.
+
+        Returns:
+            The initiator and the responder callback events, each mapped by
+            callback name for find_callback_name.
+        """
+        return utils.concurrent_exec(
+            lambda ad, key: _index_by_callback_name(
+                self.network_callback_event(
+                    ad,
+                    key,
+                    _NETWORK_CALLBACK,
+                    timeout=_DEFAULT_TIMEOUT)),
+            ((init_dut, init_req_key), (resp_dut, resp_req_key)),
+            max_workers=2,
+            raise_on_exception=True,
+        )
+
+    def find_callback_name(self, events_by_name, name):
+        """Returns the first event with the given callback name.
+
+        Args:
+            events_by_name: Events mapped by _index_by_callback_name.
+            name: The callback name to look up.
+        """
+        event = events_by_name.get(name)
+        if event is None:
+            raise ValueError(f"Callback with name '{name}' not found.")
+        return event
 
     def attach_with_identity(self, dut):
         """Start an Aware session (attach) and wait for confirmation and
@@ -253,15 +344,16 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
         net_work_request_id: str,
     ) -> callback_handler_v2.CallbackHandlerV2:
         """Requests a Wi-Fi Aware network."""
+        snippet = ad.wifi_aware_snippet
         network_specifier_parcel = (
-            ad.wifi_aware_snippet.createNetworkSpecifierOob(
+            snippet.createNetworkSpecifierOob(
                 aware_session, role, mac, passphrase, pmk)
         )
         network_request_dict = constants.NetworkRequest(
-            transport_type=constants.NetworkCapabilities.Transport.TRANSPORT_WIFI_AWARE,
+            transport_type=_TRANSPORT_TYPE_WIFI_AWARE,
             network_specifier_parcel=network_specifier_parcel["result"],
         ).to_dict()
-        return ad.wifi_aware_snippet.connectivityRequestNetwork(
+        return snippet.connectivityRequestNetwork(
             net_work_request_id, network_request_dict, _REQUEST_NETWORK_TIMEOUT_MS
         )
 
@@ -288,6 +380,8 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             resp_aware_if: Responder Aware data interface
             init_ipv6: Initiator IPv6 address
             resp_ipv6: Responder IPv6 address
+            channel: Aware channel of the NDP
+            network_id: Id both network requests were registered with
         """
         # Responder: request network
         init_dut_accept_handler = (
@@ -313,35 +407,29 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             None,
             network_id
             )
-        time.sleep(5)
-        init_callback_event = self.network_callback_event(
-            init_req_key,
-            constants.NetworkCbEventName.NETWORK_CALLBACK,
-            timeout=_DEFAULT_TIMEOUT
-        )
+        # No fixed sleep: network_callback_event blocks until the callbacks
+        # arrive, up to the timeout.
+        init_callback_event, resp_callback_event = (
+            self._collect_network_callbacks(
+                init_dut, init_req_key, resp_dut, resp_req_key))
         init_name_data =(
             self.find_callback_name(init_callback_event,
-                               constants.NetworkCbName.ON_CAPABILITIES_CHANGED)
+                               _NETWORK_CB_CAPABILITIES_CHANGED)
         )
         init_name = init_name_data.data[_CALLBACK_NAME]
-        resp_callback_event = self.network_callback_event(
-            resp_req_key,
-            constants.NetworkCbEventName.NETWORK_CALLBACK,
-            timeout=_DEFAULT_TIMEOUT
-        )
         resp_name_data =(
             self.find_callback_name(
                 resp_callback_event,
-                constants.NetworkCbName.ON_CAPABILITIES_CHANGED)
+                _NETWORK_CB_CAPABILITIES_CHANGED)
         )
         resp_name = resp_name_data.data[_CALLBACK_NAME]
         asserts.assert_equal(
-            init_name, constants.NetworkCbName.ON_CAPABILITIES_CHANGED,
+            init_name, _NETWORK_CB_CAPABILITIES_CHANGED,
             f'{init_dut} succeeded to request the network, got callback'
             f' {init_name}.'
             )
         asserts.assert_equal(
-            resp_name, constants.NetworkCbName.ON_CAPABILITIES_CHANGED,
+            resp_name, _NETWORK_CB_CAPABILITIES_CHANGED,
             f'{resp_dut} succeeded to request the network, got callback'
             f' {resp_name}.'
             )
@@ -356,9 +444,9 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             "Network specifier leak!")
 
         #To get ipv6 ip address
-        resp_ipv6= init_net_event_nc[constants.NetworkCbName.NET_CAP_IPV6]
-        init_ipv6 = resp_net_event_nc[constants.NetworkCbName.NET_CAP_IPV6]
-        channel = resp_net_event_nc[constants.NetworkCbEventKey.CHANNEL_IN_MHZ]
+        resp_ipv6= init_net_event_nc[_NETWORK_CB_KEY_IPV6]
+        init_ipv6 = resp_net_event_nc[_NETWORK_CB_KEY_IPV6]
+        channel = resp_net_event_nc[_NETWORK_CB_KEY_CHANNEL_IN_MHZ]
         # note that Pub <-> Sub since IPv6 are of peer's!
         init_callback_LINK =(
             self.find_callback_name(init_callback_event,
@@ -385,7 +473,7 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
         resp_aware_if = resp_callback_LINK.data[
             _NETWORK_CB_KEY_INTERFACE_NAME]
         return (init_req_key, resp_req_key, init_aware_if, resp_aware_if,
-            init_ipv6, resp_ipv6, channel)
+            init_ipv6, resp_ipv6, channel, network_id)
 
     def create_data_ib_ndp(
         self,
@@ -409,6 +497,8 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             - Subscriber network interface name.
             - Publisher IPv6 address.
             - Subscriber IPv6 address.
+            - Aware channel of the NDP.
+            - Id both network requests were registered with.
         """
 
         (p_id, s_id, p_disc_id, s_disc_id, peer_id_on_sub, peer_id_on_pub) = (
@@ -436,25 +526,19 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             peer=peer_id_on_sub,
             net_work_request_id=network_id,
         )
-        resp_callback_event = self.network_callback_event(
-            sub_network_cb_handler,
-            constants.NetworkCbEventName.NETWORK_CALLBACK,
-            timeout=_DEFAULT_TIMEOUT
-        )
-        init_callback_event = self.network_callback_event(
-            pub_network_cb_handler,
-            constants.NetworkCbEventName.NETWORK_CALLBACK,
-            timeout=_DEFAULT_TIMEOUT
-        )
+        init_callback_event, resp_callback_event = (
+            self._collect_network_callbacks(
+                p_dut, pub_network_cb_handler,
+                s_dut, sub_network_cb_handler))
         init_net_event_nc = self.find_callback_name(
-            init_callback_event,constants.NetworkCbName.ON_CAPABILITIES_CHANGED
+            init_callback_event,_NETWORK_CB_CAPABILITIES_CHANGED
         )
         resp_net_event_nc = self.find_callback_name(
-            resp_callback_event,constants.NetworkCbName.ON_CAPABILITIES_CHANGED
+            resp_callback_event,_NETWORK_CB_CAPABILITIES_CHANGED
         )
-        s_ipv6 = resp_net_event_nc.data[constants.NetworkCbName.NET_CAP_IPV6]
-        p_ipv6 = init_net_event_nc.data[constants.NetworkCbName.NET_CAP_IPV6]
-        channel = init_net_event_nc.data[constants.NetworkCbEventKey.CHANNEL_IN_MHZ]
+        s_ipv6 = resp_net_event_nc.data[_NETWORK_CB_KEY_IPV6]
+        p_ipv6 = init_net_event_nc.data[_NETWORK_CB_KEY_IPV6]
+        channel = init_net_event_nc.data[_NETWORK_CB_KEY_CHANNEL_IN_MHZ]
         p_network_callback_LINK = self.find_callback_name(
             init_callback_event,_NETWORK_CB_LINK_PROPERTIES_CHANGED)
         s_network_callback_LINK = self.find_callback_name(
@@ -473,6 +557,7 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             p_ipv6,
             s_ipv6,
             channel,
+            network_id,
         )
 
     def run_iperf_single_ndp_aware_only(self, use_ib, results):
@@ -496,39 +581,57 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
             not init_dut.is_adb_root or not resp_dut.is_adb_root,
             'Country code toggle needs Android device(s) with root permission',
         )
-        if use_ib:
-            (resp_req_key, init_req_key, resp_aware_if, init_aware_if,
-             resp_ipv6, init_ipv6, aware_channel) = self.create_data_ib_ndp(
-                init_dut, resp_dut,
-                 autils.create_discovery_config(
-                     self.SERVICE_NAME,
-                     _PUBLISH_TYPE_UNSOLICITED),
-                 autils.create_discovery_config(
-                     self.SERVICE_NAME,
-                     _SUBSCRIBE_TYPE_PASSIVE),
-                 )
-        else:
-            init_id, init_mac = self.attach_with_identity(init_dut)
-            resp_id, resp_mac = self.attach_with_identity(resp_dut)
-            time.sleep(self.WAIT_FOR_CLUSTER)
-            (init_req_key, resp_req_key, init_aware_if, resp_aware_if, init_ipv6,
-             resp_ipv6, aware_channel) = self.create_oob_ndp_on_sessions(
-                init_dut, resp_dut, init_id,
-                init_mac, resp_id, resp_mac)
+        # The iperf3 server listens on all interfaces and daemonizes, so it
+        # is started in the background while the NDP is being set up.
+        iperf_server_future = self._iperf_server_executor.submit(
+            autils.iperf_server, resp_dut, "-D")
+        try:
+            if use_ib:
+                (resp_req_key, init_req_key, resp_aware_if, init_aware_if,
+                 resp_ipv6, init_ipv6, aware_channel,
+                 network_id) = self.create_data_ib_ndp(
+                    init_dut, resp_dut,
+                     autils.create_discovery_config(
+                         self.SERVICE_NAME,
+                         _PUBLISH_TYPE_UNSOLICITED),
+                     autils.create_discovery_config(
+                         self.SERVICE_NAME,
+                         _SUBSCRIBE_TYPE_PASSIVE),
+                     )
+            else:
+                ((init_id, init_mac),
+                 (resp_id, resp_mac)) = utils.concurrent_exec(
+                    self.attach_with_identity,
+                    ((init_dut,), (resp_dut,)),
+                    max_workers=2,
+                    raise_on_exception=True,
+                )
+                time.sleep(self.WAIT_FOR_CLUSTER)
+                (init_req_key, resp_req_key, init_aware_if, resp_aware_if,
+                 init_ipv6, resp_ipv6, aware_channel,
+                 network_id) = self.create_oob_ndp_on_sessions(
+                    init_dut, resp_dut, init_id,
+                    init_mac, resp_id, resp_mac)
+        finally:
+            # Joined even if the NDP setup fails, so that the server start
+            # does not outlive the test.
+            server_started, server_output = iperf_server_future.result()
+        asserts.assert_true(
+            server_started, f"iperf3 server failed to start: {server_output}")
         logging.info("Interface names: I=%s, R=%s", init_aware_if,
                       resp_aware_if)
         logging.info("Interface addresses (IPv6): I=%s, R=%s", init_ipv6,
                       resp_ipv6)
         #  Run iperf3
-        autils.iperf_server(resp_dut,  "-D")
         result, data = init_dut.run_iperf_client(resp_ipv6, "-6 -J")
-        pub_accept_handler = (
-            init_dut.wifi_aware_snippet.connectivityServerSocketAccept()
-        )
-        network_id = pub_accept_handler.callback_id
         # clean-up
-        resp_dut.wifi_aware_snippet.connectivityUnregisterNetwork(network_id)
-        init_dut.wifi_aware_snippet.connectivityUnregisterNetwork(network_id)
+        utils.concurrent_exec(
+            lambda ad: ad.wifi_aware_snippet.connectivityUnregisterNetwork(
+                network_id),
+            ((resp_dut,), (init_dut,)),
+            max_workers=2,
+            raise_on_exception=True,
+        )
         # Collect results
         data_json = json.loads("".join(data))
         if "error" in data_json:
@@ -553,7 +656,7 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
         resp_dut = self.ads[1]
         resp_dut.pretty_name = "Responder"
         (resp_req_key, init_req_key, resp_aware_if, init_aware_if,
-         resp_ipv6, init_ipv6, channel) = self.create_data_ib_ndp(
+         resp_ipv6, init_ipv6, channel, network_id) = self.create_data_ib_ndp(
             resp_dut, init_dut,
             autils.create_discovery_config(
                 self.SERVICE_NAME, _PUBLISH_TYPE_UNSOLICITED),
@@ -570,14 +673,9 @@ class WifiAwareThroughputTest(base_test.BaseTestClass):
         logging.info("Interface addresses (IPv6): P=%s, S=%s", p_ipv6, s_ipv6)
         logging.info("Start ping %s from %s", s_ipv6, p_ipv6)
         latency_result = autils.run_ping6(init_dut, s_ipv6)
-        decoded_output = latency_result.decode('utf-8')
-        data_list = []
-        data_list.append(decoded_output)
-        ping_output = data_list[0]
-        pattern = r'rtt min/avg/max/mdev = ([\d./]+)'
-        time_pattern = r'time (\d+ms)\s+'
-        total_ping_time = re.findall(time_pattern, ping_output)
-        avg_ping_time = re.findall(pattern, ping_output)
+        ping_output = latency_result.decode('utf-8')
+        total_ping_time = _PING_TIME_PATTERN.findall(ping_output)
+        avg_ping_time = _PING_RTT_PATTERN.findall(ping_output)
         logging.info(
             "The traffic min/avg/max/mdev ping results: %s, the time: %s",
             avg_ping_time, total_ping_time)
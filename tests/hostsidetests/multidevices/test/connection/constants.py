@@ -38,7 +38,7 @@ class PatternType(enum.IntEnum):
   PATTERN_SUFFIX = 4
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class PatternMatcher:
   """Pattern matcher."""
 
@@ -50,7 +50,7 @@ class PatternMatcher:
     return {'pattern': self.pattern, 'pattern_type': self.pattern_type}
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class BssidPattern:
   """BSSID pattern."""
 
@@ -67,7 +67,7 @@ class BssidPattern:
     return result
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class NetworkSpecifier:
   """Network specification.
 
@@ -96,7 +96,7 @@ class NetworkSpecifier:
     return result
 
 
-@dataclasses.dataclass(frozen=False)
+@dataclasses.dataclass(frozen=False, slots=True)
 class NetworkSuggestion:
   """Network Suggestion.
 
@@ -112,7 +112,20 @@ class NetworkSuggestion:
 
   def to_dict(self) -> dict[str, str | int | bool]:
     """Returns a dict representation of NetworkSuggestion."""
-    return {k: v for k, v in dataclasses.asdict(self).items() if v is not None}
+    result = {}
+    if self.ssid is not None:
+      result['ssid'] = self.ssid
+    if self.bssid is not None:
+      result['bssid'] = self.bssid
+    if self.psk is not None:
+      result['psk'] = self.psk
+    if self.is_hidden_ssid is not None:
+      result['is_hidden_ssid'] = self.is_hidden_ssid
+    if self.is_metered is not None:
+      result['is_metered'] = self.is_metered
+    if self.is_app_interaction_required is not None:
+      result['is_app_interaction_required'] = self.is_app_interaction_required
+    return result
 
 
 @enum.unique
@@ -176,7 +189,7 @@ class TransportType(enum.IntEnum):
   TRANSPORT_LOWPAN = 6
 
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class NetworkRequest:
   """Network request parameters."""
 